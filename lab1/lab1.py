@@ -1,4 +1,11 @@
+import argparse
+import mmap
+import os
+import pickle
 import random
+import sys
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
 
 class Grammar:
     """Represents a context-free grammar."""
@@ -9,19 +16,386 @@ class Grammar:
         self.terminals = terminals
         self.productions = productions
         self.start_symbol = start_symbol
+        self._tables = None
+        self._counts = None
 
-    def generate_string(self):
-        """Generates a string by randomly expanding the start symbol based on the grammar's productions."""
+    def generation_tables(self, weights=None):
+        """Returns the choice tables used for generation, cached unless custom weights are given.
 
-        def expand(symbol):
+        weights maps a variable to one weight per production; productions are uniform otherwise.
+        The cache assumes the productions are not changed after the first string is generated.
+        """
+        if weights is not None:
+            return _GenerationTables(self, weights)
+        if self._tables is None:
+            self._tables = _GenerationTables(self)
+        return self._tables
+
+    def generate_string(self, max_length=None, max_depth=None):
+        """Generates a string by randomly expanding the start symbol based on the grammar's productions.
+
+        The expansion runs on an explicit stack, so deep right recursion cannot hit the recursion limit.
+        max_length bounds the length of the string and max_depth the height of its derivation tree;
+        once a budget gets tight only productions that can still finish within it are chosen.
+        """
+        return self.generation_tables().generate(random, max_length, max_depth)
+
+    def generate_many(self, n, seed=None, max_length=None, max_depth=None, weights=None):
+        """Generates n strings from one seeded random generator, reusing the tables and buffers."""
+        tables = self.generation_tables(weights)
+        rng = random.Random(seed)
+        stack, depths, output = [], [], []
+        return [tables.generate(rng, max_length, max_depth, stack, depths, output) for _ in range(n)]
+
+    def derivation_counts(self):
+        """Returns the cached per-length derivation counts of the grammar, grown on demand."""
+        if self._counts is None:
+            self._counts = _DerivationCounts(self)
+        return self._counts
+
+    def count_derivations(self, length):
+        """Number of derivations of a string of exactly this length; for an unambiguous grammar
+        such as the shipped one this is the number of strings of that length in the language."""
+        return self.derivation_counts().count(self.start_symbol, length)
+
+    def sample_strings(self, length, n=1, seed=None):
+        """Draws n strings of the given length, each derivation of that length equally likely.
+
+        The counts are computed once per grammar and length, so later samples at the same length
+        only walk one derivation.
+        """
+        counts = self.derivation_counts()
+        rng = random.Random(seed)
+        return [counts.sample(length, rng) for _ in range(n)]
+
+
+class _GenerationTables:
+    """Per-variable choice tables of a Grammar with the bounds needed to honour generation budgets.
+
+    choices[variable] holds the productions as reversed symbol tuples (ready to push on the stack),
+    their cumulative weights, and for each production the shortest string and the lowest derivation
+    tree it can finish with; min_length and min_height hold the same bounds per symbol. runs[variable]
+    holds the same productions split into terminal text and variables for the unbudgeted loop.
+    """
+
+    def __init__(self, grammar, weights=None):
+        """Precomputes the choice tables and the shortest-length and lowest-height bounds."""
+        self.terminals = set(grammar.terminals)
+        self.start_symbol = grammar.start_symbol
+        expansions = {}
+        for variable, productions in grammar.productions.items():
+            if variable not in self.terminals and productions:
+                expansions[variable] = [tuple(production) for production in productions]
+
+        # Terminals have length 1 and height 0; symbols with no productions expand to nothing
+        infinity = float('inf')
+        self.min_length = {variable: infinity for variable in expansions}
+        self.min_height = {variable: infinity for variable in expansions}
+        changed = True
+        while changed:
+            changed = False
+            for variable, options in expansions.items():
+                for production in options:
+                    length = sum(self._bound(self.min_length, symbol, 1) for symbol in production)
+                    height = 1 + max((self._bound(self.min_height, symbol, 0) for symbol in production), default=0)
+                    if length < self.min_length[variable]:
+                        self.min_length[variable] = length
+                        changed = True
+                    if height < self.min_height[variable]:
+                        self.min_height[variable] = height
+                        changed = True
+
+        self.choices = {}
+        self.runs = {}
+        for variable, options in expansions.items():
+            cumulative = []
+            total = 0
+            for weight in (weights or {}).get(variable, [1] * len(options)):
+                total += weight
+                cumulative.append(total)
+            lengths = [sum(self._bound(self.min_length, symbol, 1) for symbol in production) for production in options]
+            heights = [1 + max((self._bound(self.min_height, symbol, 0) for symbol in production), default=0)
+                       for production in options]
+            self.choices[variable] = ([production[::-1] for production in options], cumulative, lengths, heights,
+                                      max(lengths), max(heights))
+            self.runs[variable] = ([self._runs(production) for production in options], cumulative)
+
+    def _runs(self, production):
+        """Splits a production into its leading terminal text and the rest, reversed for the stack.
+
+        Adjacent terminals in the rest are merged into one piece of text and symbols that have no
+        productions are dropped, so the unbudgeted loop only has to tell variables from text.
+        """
+        pieces = []
+        for symbol in production:
             if symbol in self.terminals:
-                return symbol
-            if symbol not in self.productions:
-                return ''
-            prod = random.choice(self.productions[symbol])
-            return ''.join(expand(sym) for sym in prod)
+                if pieces and pieces[-1][0]:
+                    pieces[-1] = (True, pieces[-1][1] + symbol)
+                else:
+                    pieces.append((True, symbol))
+            elif symbol in self.min_length:
+                pieces.append((False, symbol))
+        lead = pieces.pop(0)[1] if pieces and pieces[0][0] else ''
+        return lead, tuple(piece for _, piece in reversed(pieces))
+
+    def _bound(self, bounds, symbol, terminal_bound):
+        if symbol in self.terminals:
+            return terminal_bound
+        return bounds.get(symbol, 0)
+
+    def generate(self, rng, max_length=None, max_depth=None, stack=None, depths=None, output=None):
+        """Expands the start symbol on an explicit stack, drawing productions from rng."""
+        stack = [] if stack is None else stack
+        depths = [] if depths is None else depths
+        output = [] if output is None else output
+        del stack[:], depths[:], output[:]
+        start = self.start_symbol
+        # pending is the shortest length the string can still end up with
+        pending = self._bound(self.min_length, start, 1)
+        if max_length is not None and pending > max_length:
+            raise ValueError(f"the shortest string of the grammar is longer than {max_length}")
+        if max_depth is not None and self._bound(self.min_height, start, 0) > max_depth:
+            raise ValueError(f"every derivation of the grammar is deeper than {max_depth}")
+
+        terminals = self.terminals
+        choices = self.choices
+        random_value = rng.random
+        if start not in choices:
+            return start if start in terminals else ''
+        stack.append(start)
+        if max_length is None and max_depth is None:
+            runs = self.runs
+            pop, push, emit = stack.pop, stack.extend, output.append
+            while stack:
+                symbol = pop()
+                if symbol not in runs:
+                    emit(symbol)
+                    continue
+                expansions, cumulative = runs[symbol]
+                lead, rest = expansions[bisect_right(cumulative, random_value() * cumulative[-1])]
+                emit(lead)
+                push(rest)
+            return ''.join(output)
+
+        depths.append(0)
+        while stack:
+            symbol = stack.pop()
+            depth = depths.pop()
+            if symbol in terminals:
+                output.append(symbol)
+                continue
+            if symbol not in choices:
+                continue
+            expansions, cumulative, lengths, heights, longest, highest = choices[symbol]
+            slack = None if max_length is None else max_length - pending + self.min_length[symbol]
+            room = None if max_depth is None else max_depth - depth
+            if (slack is None or longest <= slack) and (room is None or highest <= room):
+                choice = bisect_right(cumulative, random_value() * cumulative[-1])
+            else:
+                choice = self._choose_within(cumulative, lengths, heights, slack, room, random_value)
+            pending += lengths[choice] - self.min_length[symbol]
+            expansion = expansions[choice]
+            stack.extend(expansion)
+            depths.extend([depth + 1] * len(expansion))
+        return ''.join(output)
+
+    def _choose_within(self, cumulative, lengths, heights, slack, room, random_value):
+        """Picks a production by weight among the ones that can still finish within the budgets."""
+        allowed = []
+        previous = 0
+        for choice, bound in enumerate(cumulative):
+            if (slack is None or lengths[choice] <= slack) and (room is None or heights[choice] <= room):
+                allowed.append((choice, bound - previous))
+            previous = bound
+        if not allowed:
+            raise ValueError("no production fits both the length and the depth budget")
+        target = random_value() * sum(weight for _, weight in allowed)
+        for choice, weight in allowed:
+            target -= weight
+            if target < 0:
+                return choice
+        return allowed[-1][0]
+
+
+class _DerivationCounts:
+    """Exact numbers of derivations of every length for the symbols of a Grammar.
+
+    counts[variable][n] is the number of derivation trees of the variable whose string has length n.
+    For production number p of a variable, suffixes[variable][p][i][n] counts the derivations of its
+    symbols from position i on that together have length n, which is what both the counts and the
+    top-down choices of a sample are read from. Tables only grow, and the weighted choices made while
+    sampling are cached by their position in the tables.
+    """
+
+    def __init__(self, grammar):
+        """Orders the variables so that every count only depends on counts that are already known."""
+        self.terminals = set(grammar.terminals)
+        self.start_symbol = grammar.start_symbol
+        productions = {variable: [tuple(production) for production in options]
+                       for variable, options in grammar.productions.items()
+                       if variable not in self.terminals and options}
+        # Only the variables reachable from the start symbol matter
+        self.productions = {}
+        pending = [self.start_symbol]
+        while pending:
+            variable = pending.pop()
+            if variable in productions and variable not in self.productions:
+                self.productions[variable] = productions[variable]
+                pending.extend(symbol for production in productions[variable] for symbol in production)
+        self.counts = {variable: [] for variable in self.productions}
+        self.suffixes = {variable: [[[] for _ in range(len(production) + 1)] for production in options]
+                         for variable, options in self.productions.items()}
+        self.choices = {}
+        self.filled = 0
+
+        # Symbols with no productions expand to the empty string, as in generate_string
+        nullable = {symbol for options in self.productions.values() for production in options
+                    for symbol in production if symbol not in self.terminals and symbol not in self.productions}
+        generating = set(self.terminals) | nullable
+        changed = True
+        while changed:
+            changed = False
+            for variable, options in self.productions.items():
+                for production in options:
+                    if variable not in generating and all(symbol in generating for symbol in production):
+                        generating.add(variable)
+                        changed = True
+                    if variable not in nullable and all(symbol in nullable for symbol in production):
+                        nullable.add(variable)
+                        changed = True
 
-        return expand(self.start_symbol)
+        # A count of length n needs the counts of length n of the symbols that can take the whole
+        # string while the rest of their production derives the empty string; at length 0 that is
+        # every symbol of a nullable production. The variables are sorted along those dependencies
+        self.orders = []
+        for empty in (True, False):
+            needs = {}
+            for variable, options in self.productions.items():
+                needs[variable] = set()
+                for production in options:
+                    if not all(symbol in generating for symbol in production):
+                        continue
+                    for index, symbol in enumerate(production):
+                        others = production[:index] + production[index + 1:]
+                        if (symbol in self.productions and all(other in nullable for other in others)
+                                and (not empty or symbol in nullable)):
+                            needs[variable].add(symbol)
+            self.orders.append(self._dependency_order(needs))
+
+    def _dependency_order(self, needs):
+        """Sorts the variables so that each comes after the ones it needs, rejecting cycles."""
+        order = []
+        state = {}
+        for first in needs:
+            if first in state:
+                continue
+            state[first] = 'open'
+            stack = [(first, iter(needs[first]))]
+            while stack:
+                variable, pending = stack[-1]
+                for needed in pending:
+                    if state.get(needed) == 'open':
+                        raise ValueError(f"{needed} derives itself, so some lengths have infinitely many derivations")
+                    if needed not in state:
+                        state[needed] = 'open'
+                        stack.append((needed, iter(needs[needed])))
+                        break
+                else:
+                    stack.pop()
+                    state[variable] = 'done'
+                    order.append(variable)
+        return order
+
+    def count(self, symbol, length):
+        """Number of derivations of the symbol with a string of the given length."""
+        self.extend(length)
+        return self._count(symbol, length)
+
+    def _count(self, symbol, length):
+        """Reads a count from the tables as they are, without growing them."""
+        if symbol in self.terminals:
+            return 1 if length == 1 else 0
+        if symbol not in self.productions:
+            return 1 if length == 0 else 0
+        counts = self.counts[symbol]
+        return counts[length] if length < len(counts) else 0
+
+    def extend(self, length):
+        """Fills the tables up to the given length, one length at a time."""
+        while self.filled <= length:
+            size = self.filled
+            # The counts at this length come out right in dependency order, but a suffix entry whose
+            # prefix cannot be empty may have read a count that was not known yet, so every suffix
+            # entry of this length is recomputed once all the counts are in
+            for variable in self.orders[0] if size == 0 else self.orders[1]:
+                for production, suffixes in zip(self.productions[variable], self.suffixes[variable]):
+                    suffixes[len(production)].append(1 if size == 0 else 0)
+                    for index in range(len(production) - 1, -1, -1):
+                        suffixes[index].append(0)
+                    self._fill_suffixes(production, suffixes, size)
+                self.counts[variable].append(sum(suffixes[0][size] for suffixes in self.suffixes[variable]))
+            for variable, options in self.productions.items():
+                for production, suffixes in zip(options, self.suffixes[variable]):
+                    self._fill_suffixes(production, suffixes, size)
+            self.filled += 1
+
+    def _fill_suffixes(self, production, suffixes, size):
+        for index in range(len(production) - 1, -1, -1):
+            symbol = production[index]
+            after = suffixes[index + 1]
+            if index == len(production) - 1:
+                ways = self._count(symbol, size)
+            elif symbol in self.terminals:
+                ways = after[size - 1] if size else 0
+            else:
+                ways = sum(self._count(symbol, part) * after[size - part] for part in range(size + 1))
+            suffixes[index][size] = ways
+
+    def _choose(self, key, weights, rng):
+        """Draws an index in proportion to big-integer weights; the cumulative table is cached by key."""
+        if key not in self.choices:
+            cumulative = []
+            total = 0
+            for weight in weights():
+                total += weight
+                cumulative.append(total)
+            self.choices[key] = cumulative
+        cumulative = self.choices[key]
+        return bisect_right(cumulative, rng.randrange(cumulative[-1]))
+
+    def sample(self, length, rng):
+        """Draws one derivation of the given length uniformly and returns its string."""
+        if self.count(self.start_symbol, length) == 0:
+            raise ValueError(f"the grammar derives no string of length {length}")
+        output = []
+        stack = [(self.start_symbol, length)]
+        while stack:
+            symbol, size = stack.pop()
+            if symbol in self.terminals:
+                output.append(symbol)
+                continue
+            if symbol not in self.productions:
+                continue
+            suffixes = self.suffixes[symbol]
+            choice = self._choose((symbol, size), lambda: (table[0][size] for table in suffixes), rng)
+            production = self.productions[symbol][choice]
+            tables = suffixes[choice]
+            parts = []
+            remaining = size
+            for index, part_symbol in enumerate(production):
+                if index == len(production) - 1:
+                    part = remaining
+                elif part_symbol in self.terminals:
+                    part = 1
+                else:
+                    after = tables[index + 1]
+                    part = self._choose((symbol, choice, index, remaining),
+                                        lambda: (self.count(part_symbol, part) * after[remaining - part]
+                                                 for part in range(remaining + 1)), rng)
+                parts.append((part_symbol, part))
+                remaining -= part
+            stack.extend(reversed(parts))
+        return ''.join(output)
 
 
 class FiniteAutomaton:
@@ -36,7 +410,10 @@ class FiniteAutomaton:
         self.accept_states = accept_states
 
     def string_belongs_to_language(self, input_string):
-        """Checks if the given string is accepted by the automaton."""
+        """Checks if the given string is accepted by the automaton.
+
+        This is the reference implementation; CompiledAutomaton must agree with it on every input.
+        """
         current_state = self.start_state
         for symbol in input_string:
             if symbol not in self.alphabet:
@@ -47,6 +424,352 @@ class FiniteAutomaton:
                 return False
         return current_state in self.accept_states
 
+    def compile(self):
+        """Builds the table-driven form of the automaton used for bulk membership checks."""
+        return CompiledAutomaton(self)
+
+    def accepts_many(self, strings):
+        """Checks a batch of strings against the compiled automaton, returning a list of booleans.
+
+        The automaton is compiled on the first call and the table is reused by later batches, so edits
+        to the automaton after that are not seen here; compile() always builds a fresh table.
+        """
+        if getattr(self, '_compiled', None) is None:
+            self._compiled = self.compile()
+        return self._compiled.accepts_many(strings)
+
+
+class CompiledAutomaton:
+    """Dense transition table of a FiniteAutomaton with states and symbols interned to integers.
+
+    Row 0 of the table is an explicit dead state that every missing transition leads to, and the
+    last column is reserved for characters outside the alphabet. Table entries hold row offsets
+    (state * width) so a step is a single list index.
+    """
+
+    def __init__(self, automaton):
+        """Interns the states and symbols of the automaton and fills the transition table."""
+        # Only single-character symbols can ever match, since input strings are scanned per character
+        self.symbols = sorted(symbol for symbol in automaton.alphabet if len(symbol) == 1)
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.reject_symbol = len(self.symbols)
+        self.width = len(self.symbols) + 1
+
+        states = set(automaton.states) | set(automaton.accept_states) | {automaton.start_state}
+        for state, transitions in automaton.transition_function.items():
+            states.add(state)
+            states.update(transitions.values())
+        self.state_names = [None] + sorted(states, key=str)
+        self.state_ids = {state: i for i, state in enumerate(self.state_names) if i}
+
+        self.table = [0] * (len(self.state_names) * self.width)
+        for state, transitions in automaton.transition_function.items():
+            row = self.state_ids[state] * self.width
+            for symbol, target in transitions.items():
+                if symbol in self.symbol_ids:
+                    self.table[row + self.symbol_ids[symbol]] = self.state_ids[target] * self.width
+        self.start = self.state_ids[automaton.start_state] * self.width
+        self.accepting = [False] * len(self.table)
+        for state in automaton.accept_states:
+            self.accepting[self.state_ids[state] * self.width] = True
+
+        self._byte_table = None
+        self._char_table = None
+        if self.width <= 256:
+            # Any byte outside the alphabet maps to the reject column
+            codes = [self.reject_symbol] * 256
+            for symbol, symbol_id in self.symbol_ids.items():
+                if ord(symbol) < 256:
+                    codes[ord(symbol)] = symbol_id
+            self._byte_table = bytes(codes)
+            self._wide_alphabet = any(ord(symbol) >= 256 for symbol in self.symbols)
+            if self._wide_alphabet:
+                self._char_table = _SymbolTranslation(
+                    {ord(symbol): symbol_id for symbol, symbol_id in self.symbol_ids.items()},
+                    self.reject_symbol)
+
+    def encode(self, input_string):
+        """Translates a string (or bytes, read as latin-1) into a sequence of symbol ids."""
+        if isinstance(input_string, str):
+            if self._byte_table is not None and not self._wide_alphabet:
+                try:
+                    return input_string.encode('latin-1').translate(self._byte_table)
+                except UnicodeEncodeError:
+                    # Characters above U+00FF cannot belong to a latin-1 alphabet
+                    return bytes([self.reject_symbol])
+            if self._char_table is not None:
+                return input_string.translate(self._char_table).encode('latin-1')
+            return [self.symbol_ids.get(symbol, self.reject_symbol) for symbol in input_string]
+        if self._byte_table is not None:
+            return bytes(input_string).translate(self._byte_table)
+        return [self.symbol_ids.get(chr(byte), self.reject_symbol) for byte in input_string]
+
+    def accepts(self, input_string):
+        """Checks if the given string is accepted by the automaton."""
+        table = self.table
+        state = self.start
+        for symbol_id in self.encode(input_string):
+            state = table[state + symbol_id]
+            if not state:
+                return False
+        return self.accepting[state]
+
+    def accepts_many(self, strings):
+        """Checks every string of an iterable, returning a list of booleans in the same order."""
+        table = self.table
+        accepting = self.accepting
+        start = self.start
+        encode = self.encode
+        results = []
+        for input_string in strings:
+            state = start
+            for symbol_id in encode(input_string):
+                state = table[state + symbol_id]
+                if not state:
+                    break
+            results.append(accepting[state])
+        return results
+
+    def encode_matrix(self, strings):
+        """Encodes a batch of strings as a padded 2-D NumPy symbol matrix plus a per-row length array.
+
+        Rows shorter than the longest string are padded with the pad symbol, whose column maps every
+        state to itself.
+        """
+        import numpy as np
+
+        strings = list(strings)
+        lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        columns = int(lengths.max()) if len(strings) else 0
+        pad_symbol = self.width
+        data = None
+        if pad_symbol < 256 and self._byte_table is not None and not self._wide_alphabet:
+            # The whole batch is translated in one call when every string fits in latin-1
+            try:
+                data = ''.join(strings).encode('latin-1').translate(self._byte_table)
+            except (TypeError, UnicodeEncodeError):
+                data = None
+        if data is not None:
+            symbols = np.frombuffer(data, dtype=np.uint8)
+            if len(symbols) == len(strings) * columns:
+                # Fixed-width records need no padding
+                return symbols.reshape(len(strings), columns), lengths
+            matrix = np.full((len(strings), columns), pad_symbol, dtype=np.uint8)
+            matrix[np.arange(columns) < lengths[:, None]] = symbols
+            return matrix, lengths
+
+        encoded = [self.encode(input_string) for input_string in strings]
+        if pad_symbol < 256 and all(isinstance(row, bytes) for row in encoded):
+            padding = bytes([pad_symbol])
+            data = b''.join(row.ljust(columns, padding) for row in encoded)
+            matrix = np.frombuffer(data, dtype=np.uint8).reshape(len(encoded), columns)
+        else:
+            matrix = np.full((len(encoded), columns), pad_symbol, dtype=np.int32)
+            for i, row in enumerate(encoded):
+                matrix[i, :len(row)] = list(row)
+        return matrix, lengths
+
+    def accepts_matrix(self, matrix, lengths=None):
+        """Advances every row of a symbol matrix through the table at once, one column per step.
+
+        Returns a boolean mask with one entry per row. When lengths is given, cells past the end of
+        each row are treated as padding whatever they contain.
+        """
+        import numpy as np
+
+        table, accepting = self._numpy_tables()
+        matrix = np.asarray(matrix)
+        rows, columns = matrix.shape
+        if lengths is not None:
+            padded = np.arange(columns) >= np.asarray(lengths)[:, None]
+            if padded.any():
+                matrix = np.where(padded, self.width, matrix)
+        # Column-major copy so every step reads a contiguous column
+        matrix = np.asfortranarray(matrix)
+        states = np.full(rows, self.start // self.width, dtype=table.dtype)
+        for column in range(columns):
+            states = table[states, matrix[:, column]]
+        return accepting[states]
+
+    def accepts_array(self, strings):
+        """Checks a batch of strings with the NumPy backend, returning a boolean mask."""
+        # encode_matrix already fills short rows with the pad symbol, so the lengths are not needed
+        matrix, _ = self.encode_matrix(strings)
+        return self.accepts_matrix(matrix)
+
+    def _numpy_tables(self):
+        """Builds (once) the 2-D NumPy transition table with the pad column and the accepting mask."""
+        if getattr(self, '_np_table', None) is None:
+            import numpy as np
+
+            count = len(self.state_names)
+            table = np.array(self.table, dtype=np.int32).reshape(count, self.width) // self.width
+            self._np_table = np.hstack([table, np.arange(count, dtype=np.int32)[:, None]])
+            self._np_accepting = np.array(self.accepting[::self.width], dtype=bool)
+        return self._np_table, self._np_accepting
+
+    def scanner(self):
+        """Creates a resumable scanner that checks input arriving in chunks."""
+        return AutomatonScanner(self)
+
+    def accepts_file(self, path, chunk_size=1 << 20, use_mmap=True):
+        """Checks if the whole content of a file, read as latin-1, is accepted by the automaton.
+
+        The file is scanned through mmap, or through a single reused readinto buffer when use_mmap
+        is False, so memory use does not depend on the file size.
+        """
+        scanner = self.scanner()
+        with open(path, 'rb') as file:
+            if use_mmap and os.fstat(file.fileno()).st_size > 0:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(0, len(view), chunk_size):
+                            if not scanner.feed(view[offset:offset + chunk_size]):
+                                break
+                    finally:
+                        view.release()
+            else:
+                buffer = bytearray(chunk_size)
+                view = memoryview(buffer)
+                while True:
+                    size = file.readinto(buffer)
+                    if not size or not scanner.feed(view[:size]):
+                        break
+        return scanner.finish()
+
+    def _byte_transitions(self):
+        """Builds (once) a table indexed directly by state * 256 + byte, so raw buffers need no translation."""
+        if getattr(self, '_byte_rows', None) is None:
+            rows = [0] * (len(self.state_names) * 256)
+            codes = self._byte_table if self._byte_table is not None else [
+                self.symbol_ids.get(chr(byte), self.reject_symbol) for byte in range(256)]
+            for state in range(1, len(self.state_names)):
+                row = state * self.width
+                for byte in range(256):
+                    rows[state * 256 + byte] = self.table[row + codes[byte]] // self.width * 256
+            self._byte_rows = rows
+        return self._byte_rows
+
+
+class AutomatonScanner:
+    """Resumable membership check that carries the current state across chunk boundaries."""
+
+    def __init__(self, compiled):
+        """Starts a scan from the start state of a compiled automaton."""
+        self.compiled = compiled
+        self.transitions = compiled._byte_transitions()
+        self.reset()
+
+    def reset(self):
+        """Moves the scanner back to the start state."""
+        self.state = self.compiled.start // self.compiled.width * 256
+
+    def feed(self, chunk):
+        """Consumes a chunk (bytes-like object or string) and returns False once the input can no longer be accepted."""
+        state = self.state
+        if not state:
+            return False
+        if isinstance(chunk, str):
+            table = self.compiled.table
+            width = self.compiled.width
+            state = state // 256 * width
+            for symbol_id in self.compiled.encode(chunk):
+                state = table[state + symbol_id]
+                if not state:
+                    break
+            self.state = state // width * 256
+        else:
+            transitions = self.transitions
+            for byte in memoryview(chunk).cast('B'):
+                state = transitions[state + byte]
+                if not state:
+                    break
+            self.state = state
+        return bool(self.state)
+
+    def finish(self):
+        """Returns whether all the input fed so far is accepted, and resets the scanner."""
+        accepted = self.compiled.accepting[self.state // 256 * self.compiled.width]
+        self.reset()
+        return accepted
+
+
+class _SymbolTranslation(dict):
+    """str.translate mapping that sends every character outside the alphabet to the reject symbol."""
+
+    def __init__(self, mapping, reject_symbol):
+        super().__init__(mapping)
+        self.reject_symbol = reject_symbol
+
+    def __missing__(self, key):
+        return self.reject_symbol
+
+
+def shard_ranges(path, shard_size=1 << 24):
+    """Splits a file into (start, end) byte ranges of about shard_size bytes that end on newline boundaries."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    ranges = []
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        start = 0
+        while start < size:
+            newline = mapped.find(b'\n', min(start + shard_size, size) - 1)
+            end = size if newline == -1 else newline + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+_worker_compiled = None
+_worker_decode = False
+
+
+def _init_worker(automaton):
+    """Compiles the automaton once per worker process."""
+    global _worker_compiled, _worker_decode
+    _worker_compiled = automaton.compile()
+    # Lines can be checked as raw bytes unless the alphabet has non-ASCII symbols
+    _worker_decode = any(ord(symbol) > 127 for symbol in _worker_compiled.symbols)
+
+
+def _validate_shard(path, start, end):
+    """Checks every line in a byte range of the file, returning one result byte per line."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        lines = file.read(end - start).split(b'\n')
+    if lines[-1] == b'':
+        lines.pop()
+    lines = [line[:-1] if line.endswith(b'\r') else line for line in lines]
+    if _worker_decode:
+        lines = [line.decode('utf-8', errors='replace') for line in lines]
+    return bytes(_worker_compiled.accepts_many(lines))
+
+
+def validate_file(automaton, path, workers=None, shard_size=1 << 24):
+    """Checks every line of a newline-delimited file against the automaton on a pool of processes.
+
+    Returns the per-line results in file order and a dictionary with the accepted and rejected counts.
+    """
+    ranges = shard_ranges(path, shard_size)
+    results = bytearray()
+    if workers == 1 or len(ranges) <= 1:
+        _init_worker(automaton)
+        for start, end in ranges:
+            results += _validate_shard(path, start, end)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(automaton,)) as executor:
+            paths = [path] * len(ranges)
+            starts = [start for start, _ in ranges]
+            ends = [end for _, end in ranges]
+            for shard_results in executor.map(_validate_shard, paths, starts, ends):
+                results += shard_results
+    accepted = results.count(1)
+    counts = {'accepted': accepted, 'rejected': len(results) - accepted}
+    return [bool(result) for result in results], counts
+
 
 # Initialize grammar and finite automaton with given components
 variables = ['S', 'A', 'B', 'C']
@@ -60,11 +783,6 @@ productions = {
 start_symbol = 'S'
 my_grammar = Grammar(variables, terminals, productions, start_symbol)
 
-# Generate and print valid strings from the grammar
-print("A list of valid strings: ")
-for _ in range(10):
-    print(my_grammar.generate_string())
-
 # Define the finite automaton's components
 states = {'S', 'A', 'B', 'C'}
 alphabet = {'a', 'b', 'c', 'd'}
@@ -104,9 +822,61 @@ test_strings = [
     'dbca'
 ]
 
-# Test and print whether each string is accepted by the automaton
-for string in test_strings:
-    if fa.string_belongs_to_language(string):
-        print(f"The string '{string}' is accepted by the automaton.")
-    else:
-        print(f"The string '{string}' is not accepted by the automaton.")
+
+def print_examples():
+    """Prints generated strings and the membership of the test strings."""
+    # Generate and print valid strings from the grammar
+    print("A list of valid strings: ")
+    for _ in range(10):
+        print(my_grammar.generate_string())
+
+    # Test and print whether each string is accepted by the automaton
+    for string in test_strings:
+        if fa.string_belongs_to_language(string):
+            print(f"The string '{string}' is accepted by the automaton.")
+        else:
+            print(f"The string '{string}' is not accepted by the automaton.")
+
+
+def main():
+    """Runs the examples, or validates a file of candidate strings when one is given."""
+    parser = argparse.ArgumentParser(description="Check strings against a finite automaton.")
+    parser.add_argument('input', nargs='?', help="newline-delimited file of candidate strings")
+    parser.add_argument('--automaton', help="pickled FiniteAutomaton to use instead of the example one")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    parser.add_argument('--shard-size', type=int, default=1 << 24, help="approximate shard size in bytes")
+    parser.add_argument('--results', help="file to write one 1/0 line per candidate string to")
+    parser.add_argument('--generate', type=int, metavar='N', help="print N strings generated from the grammar")
+    parser.add_argument('--seed', type=int, default=None, help="seed for --generate")
+    parser.add_argument('--max-length', type=int, default=None, help="length budget for --generate")
+    parser.add_argument('--length', type=int, default=None,
+                        help="make --generate draw strings of exactly this length, uniformly")
+    args = parser.parse_args()
+
+    if args.generate is not None:
+        if args.length is not None:
+            strings = my_grammar.sample_strings(args.length, args.generate, seed=args.seed)
+        else:
+            strings = my_grammar.generate_many(args.generate, seed=args.seed, max_length=args.max_length)
+        sys.stdout.writelines(string + '\n' for string in strings)
+        return
+
+    if args.input is None:
+        print_examples()
+        return
+
+    automaton = fa
+    if args.automaton:
+        with open(args.automaton, 'rb') as file:
+            automaton = pickle.load(file)
+
+    results, counts = validate_file(automaton, args.input, args.workers, args.shard_size)
+    if args.results:
+        with open(args.results, 'w') as file:
+            file.writelines('1\n' if result else '0\n' for result in results)
+    print(f"Accepted: {counts['accepted']}, rejected: {counts['rejected']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
+
@@ -1,7 +1,10 @@
 import re
-import copy
-import networkx as nx
-import matplotlib.pyplot as plt
+import argparse
+import random
+import sys
+import time
+from collections import OrderedDict, deque
+from html import escape
 
 class GrammarConverter:
 
@@ -56,73 +59,7 @@ class Automaton:
     def nfa_to_dfa(self):
         if self.is_det():
             return
-        dfa = Automaton()
-
-        chars_pattern = re.compile(r'^(.*?)\s')
-        states_pattern = re.compile(r'\s(.*)$')
-
-        transitions = {self.initial_state: self.group_states(self.transitions[self.initial_state])}
-
-        finished_states = []
-        last_state = ""
-
-        while not (self.has_all_states(transitions)):
-
-            transitions_copy = copy.deepcopy(transitions)
-            for value in finished_states:
-                del transitions_copy[value]
-
-            for key, values in transitions_copy.items():
-                symbols = []
-                states = []
-                for value in values:
-                    symbols.append(chars_pattern.search(value).group(1))
-                    states.append(states_pattern.search(value).group(1))
-
-                if not (len(symbols) == len(set(symbols))):
-                    unique_symbols = set(symbols)
-                    for element in unique_symbols:
-                        positions = [i for i, value in enumerate(symbols) if value == element]
-                        if len(positions) > 1:
-                            new_state = ""
-                            new_state_trans = []
-                            for position in positions:
-                                if states[position] not in new_state:
-                                    new_state += states[position]
-                                for state1 in self.degroup_states(states[position]):
-                                    for elem in self.transitions[state1]:
-                                        if elem not in new_state_trans:
-                                            new_state_trans.append(elem)
-
-                            if new_state in transitions:
-                                break
-
-                            transitions[new_state] = self.group_states(new_state_trans)
-                            last_state = new_state
-
-                for state in states:
-                    if state not in transitions:
-                        new_state_trans = []
-                        new_states = self.degroup_states(state)
-                        for new_state in new_states:
-                            for trans in self.transitions[new_state]:
-                                if trans not in new_state_trans:
-                                    new_state_trans.append(trans)
-                        new_state_trans = self.group_states(new_state_trans)
-                        transitions[state] = new_state_trans
-                        last_state = state
-
-                finished_states.append(key)
-
-        finished_states.append(last_state)
-        dfa.states = finished_states
-        dfa.final_states = []
-        for state in dfa.states:
-            if self.final_states in state:
-                dfa.final_states.append(state)
-        dfa.transitions = transitions
-
-        return dfa
+        return TransitionModel.from_automaton(self).determinize().to_automaton()
 
     def group_states(self, states_arr) -> []:
         chars_pattern = re.compile(r'^(.*?)\s')
@@ -162,7 +99,244 @@ class Automaton:
                     return False
         return True
 
-    def draw_automaton(self):
+    def final_state_list(self) -> []:
+        # The example NFA stores a single final state, nfa_to_dfa stores a list of them
+        if isinstance(self.final_states, str):
+            return [self.final_states]
+        return list(self.final_states)
+
+    def transition_table(self) -> {}:
+        names = {str(state): state for state in list(self.states) + list(self.transitions)}
+        table = {}
+        for state, transitions in self.transitions.items():
+            moves = table.setdefault(state, {})
+            for transition in transitions:
+                symbol, target = transition.split(' ', 1)
+                target = names.get(target, target)
+                if target not in moves.setdefault(symbol, []):
+                    moves[symbol].append(target)
+        return table
+
+    def accepts(self, input_string) -> bool:
+        return self.accepts_many([input_string])[0]
+
+    def accepts_many(self, strings) -> []:
+        table = self.transition_table()
+        final_states = set(self.final_state_list())
+        results = []
+        for string in strings:
+            current = {self.initial_state}
+            for symbol in string:
+                current = {target for state in current for target in table.get(state, {}).get(symbol, ())}
+                if not current:
+                    break
+            results.append(not final_states.isdisjoint(current))
+        return results
+
+    def minimize(self):
+        # Hopcroft partition refinement over the reachable part of a DFA, completed with a sink state
+        table = self.transition_table()
+        final_states = set(self.final_state_list())
+        symbols = sorted(set(self.alphabet) | {symbol for moves in table.values() for symbol in moves})
+        symbol_ids = {symbol: i for i, symbol in enumerate(symbols)}
+
+        index = {self.initial_state: 0}
+        order = [self.initial_state]
+        delta = [[] for _ in symbols]
+        for state in order:
+            moves = table.get(state, {})
+            row = [None] * len(symbols)
+            for symbol, targets in moves.items():
+                if len(targets) > 1:
+                    raise ValueError(f"minimize() needs a deterministic automaton, state {state} "
+                                     f"has several '{symbol}' transitions")
+                target = targets[0]
+                if target not in index:
+                    index[target] = len(order)
+                    order.append(target)
+                row[symbol_ids[symbol]] = index[target]
+            for i, target in enumerate(row):
+                delta[i].append(target)
+        sink = len(order)
+        count = sink + 1
+        for i in range(len(symbols)):
+            delta[i] = [sink if target is None else target for target in delta[i]] + [sink]
+
+        inverse = [[[] for _ in range(count)] for _ in symbols]
+        for i in range(len(symbols)):
+            for source, target in enumerate(delta[i]):
+                inverse[i][target].append(source)
+
+        accepting = {index[state] for state in final_states if state in index}
+        blocks = [block for block in (set(accepting), set(range(count)) - accepting) if block]
+        block_of = [0] * count
+        for block_id, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = block_id
+
+        worklist = [min(range(len(blocks)), key=lambda block_id: len(blocks[block_id]))]
+        waiting = set(worklist)
+        while worklist:
+            splitter = worklist.pop()
+            waiting.discard(splitter)
+            splitter_states = list(blocks[splitter])
+            for i in range(len(symbols)):
+                predecessors = inverse[i]
+                touched = {}
+                for state in splitter_states:
+                    for source in predecessors[state]:
+                        touched.setdefault(block_of[source], []).append(source)
+                for block_id, members in touched.items():
+                    if len(members) == len(blocks[block_id]):
+                        continue
+                    new_id = len(blocks)
+                    blocks.append(set(members))
+                    blocks[block_id].difference_update(members)
+                    for state in members:
+                        block_of[state] = new_id
+                    if block_id in waiting or len(members) < len(blocks[block_id]):
+                        worklist.append(new_id)
+                        waiting.add(new_id)
+                    else:
+                        worklist.append(block_id)
+                        waiting.add(block_id)
+
+        # Renumber the blocks in breadth-first order, dropping the dead block that holds the sink
+        dead = block_of[sink]
+        numbering = {block_of[0]: 0} if block_of[0] != dead else {}
+        queue = deque(numbering)
+        transitions = {}
+        while queue:
+            block_id = queue.popleft()
+            representative = next(iter(blocks[block_id]))
+            transitions[numbering[block_id]] = []
+            for i, symbol in enumerate(symbols):
+                target = block_of[delta[i][representative]]
+                if target == dead:
+                    continue
+                if target not in numbering:
+                    numbering[target] = len(numbering)
+                    queue.append(target)
+                transitions[numbering[block_id]].append(f"{symbol} {numbering[target]}")
+
+        dfa = Automaton()
+        dfa.alphabet = symbols
+        dfa.initial_state = 0
+        if not numbering:
+            dfa.states = [0]
+            dfa.final_states = []
+            dfa.transitions = {0: []}
+            return dfa
+        dfa.states = list(range(len(numbering)))
+        dfa.final_states = sorted({numbering[block_of[state]] for state in accepting})
+        dfa.transitions = transitions
+        return dfa
+
+    def grouped_edges(self, edges) -> {}:
+        # Target name -> comma separated symbols, so parallel edges are drawn once
+        grouped = {}
+        for edge in edges:
+            label, target = edge.split(' ', 1)
+            grouped.setdefault(target, []).append(label)
+        return {target: ",".join(labels) for target, labels in grouped.items()}
+
+    def iter_dot(self):
+        def quote(name):
+            return '"' + str(name).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+        final_states = {str(state) for state in self.final_state_list()}
+        yield "digraph automaton {"
+        yield "    rankdir=LR;"
+        yield '    __start [shape=point, label=""];'
+        for state in dict.fromkeys(list(self.states) + list(self.transitions)):
+            shape = "doublecircle" if str(state) in final_states else "circle"
+            yield f"    {quote(state)} [shape={shape}];"
+        yield f"    __start -> {quote(self.initial_state)};"
+        for node, edges in self.transitions.items():
+            for target, label in self.grouped_edges(edges).items():
+                yield f"    {quote(node)} -> {quote(target)} [label={quote(label)}];"
+        yield "}"
+
+    def to_dot(self, file=None):
+        # Graphviz DOT text, written line by line to file when one is given
+        if file is None:
+            return "\n".join(self.iter_dot()) + "\n"
+        for line in self.iter_dot():
+            file.write(line + "\n")
+
+    def svg_layout(self) -> {}:
+        # Breadth-first layers from the initial state become columns, unreachable states go last
+        names = [str(state) for state in dict.fromkeys(list(self.states) + list(self.transitions))]
+        adjacency = {str(node): [edge.split(' ', 1)[1] for edge in edges] for node, edges in self.transitions.items()}
+        layer = {str(self.initial_state): 0}
+        queue = deque(layer)
+        while queue:
+            node = queue.popleft()
+            for target in adjacency.get(node, ()):
+                if target not in layer:
+                    layer[target] = layer[node] + 1
+                    queue.append(target)
+        last = max(layer.values()) + 1
+        rows = {}
+        positions = {}
+        for name in list(layer) + [name for name in names if name not in layer]:
+            column = layer.get(name, last)
+            row = rows.get(column, 0)
+            rows[column] = row + 1
+            positions[name] = (80 + 160 * column, 60 + 90 * row)
+        return positions
+
+    def iter_svg(self):
+        positions = self.svg_layout()
+        final_states = {str(state) for state in self.final_state_list()}
+        width = max(x for x, _ in positions.values()) + 100
+        height = max(y for _, y in positions.values()) + 80
+        radius = 22
+        yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+               f'font-family="sans-serif" font-size="12">')
+        yield ('<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" '
+               'markerHeight="8" orient="auto"><path d="M0,0 L10,5 L0,10 z"/></marker></defs>')
+        x, y = positions[str(self.initial_state)]
+        yield (f'<line x1="{x - radius - 30}" y1="{y}" x2="{x - radius}" y2="{y}" '
+               f'stroke="black" marker-end="url(#arrow)"/>')
+        for node, edges in self.transitions.items():
+            x1, y1 = positions[str(node)]
+            for target, label in self.grouped_edges(edges).items():
+                x2, y2 = positions[target]
+                label = escape(label)
+                if (x1, y1) == (x2, y2):
+                    yield (f'<path d="M{x1 - 10},{y1 - radius + 2} C{x1 - 25},{y1 - radius - 35} '
+                           f'{x1 + 25},{y1 - radius - 35} {x1 + 10},{y1 - radius + 2}" fill="none" '
+                           f'stroke="black" marker-end="url(#arrow)"/>')
+                    yield f'<text x="{x1}" y="{y1 - radius - 30}" text-anchor="middle">{label}</text>'
+                    continue
+                dx, dy = x2 - x1, y2 - y1
+                length = (dx * dx + dy * dy) ** 0.5
+                ux, uy = dx / length, dy / length
+                yield (f'<line x1="{x1 + ux * radius:.1f}" y1="{y1 + uy * radius:.1f}" '
+                       f'x2="{x2 - ux * radius:.1f}" y2="{y2 - uy * radius:.1f}" '
+                       f'stroke="black" marker-end="url(#arrow)"/>')
+                yield (f'<text x="{(x1 + x2) / 2 - uy * 8:.1f}" y="{(y1 + y2) / 2 + ux * 8:.1f}" '
+                       f'text-anchor="middle">{label}</text>')
+        for name, (x, y) in positions.items():
+            yield f'<circle cx="{x}" cy="{y}" r="{radius}" fill="white" stroke="black"/>'
+            if name in final_states:
+                yield f'<circle cx="{x}" cy="{y}" r="{radius - 4}" fill="none" stroke="black"/>'
+            yield f'<text x="{x}" y="{y + 4}" text-anchor="middle">{escape(name)}</text>'
+        yield "</svg>"
+
+    def to_svg(self, file=None):
+        # Standalone SVG drawing that needs neither a display nor networkx and matplotlib
+        if file is None:
+            return "\n".join(self.iter_svg()) + "\n"
+        for line in self.iter_svg():
+            file.write(line + "\n")
+
+    def draw_automaton(self, path=None):
+        # Heavy plotting dependencies are only imported when a window or image is actually drawn
+        import networkx as nx
+        import matplotlib.pyplot as plt
+
         graph = nx.DiGraph()
 
         for node, edges in self.transitions.items():
@@ -173,17 +347,377 @@ class Automaton:
                     label = "           " + label
                     graph.add_edge(node, target, label=label)
 
-        pos = nx.planar_layout(graph)
+        try:
+            pos = nx.planar_layout(graph)
+        except nx.NetworkXException:
+            pos = nx.spring_layout(graph, seed=0)
         labels = nx.get_edge_attributes(graph, 'label')
         nx.draw(graph, pos, with_labels=True, node_size=700, node_color="red", font_size=6)
         nx.draw_networkx_edge_labels(graph, pos, edge_labels=labels, font_color='black', font_size=12)
-        plt.show()
+        if path is None:
+            plt.show()
+        else:
+            plt.savefig(path)
+            plt.close()
+
+
+class TransitionModel:
+    # NFA with integer states: for every symbol, moves[symbol][i] is the bitmask of the targets of state i
+
+    def __init__(self, states, alphabet, initial_state, final_states, moves):
+        self.states = list(states)
+        self.index = {state: i for i, state in enumerate(self.states)}
+        self.alphabet = list(alphabet)
+        self.initial_state = initial_state
+        self.final_states = list(final_states)
+        self.final_mask = 0
+        for state in self.final_states:
+            if state in self.index:
+                self.final_mask |= 1 << self.index[state]
+        self.moves = {symbol: [0] * len(self.states) for symbol in self.alphabet}
+        for state, targets_by_symbol in moves.items():
+            for symbol, targets in targets_by_symbol.items():
+                if symbol not in self.moves:
+                    self.moves[symbol] = [0] * len(self.states)
+                row = self.moves[symbol]
+                for target in targets:
+                    row[self.index[state]] |= 1 << self.index[target]
+        self.alphabet = list(self.moves)
+
+    @classmethod
+    def from_transitions(cls, transitions, initial_state, final_states, states=(), alphabet=()):
+        # Adapter for the string-encoded transitions of Automaton, e.g. {"q0": ["a q0", "a q1"]}
+        all_states = list(states)
+        seen = set(all_states)
+        moves = {}
+        for state, encoded in transitions.items():
+            if state not in seen:
+                seen.add(state)
+                all_states.append(state)
+            targets_by_symbol = moves.setdefault(state, {})
+            for transition in encoded:
+                symbol, target = transition.split(' ', 1)
+                targets_by_symbol.setdefault(symbol, set()).add(target)
+        names = {str(state): state for state in all_states}
+        for targets_by_symbol in moves.values():
+            for symbol, targets in targets_by_symbol.items():
+                targets_by_symbol[symbol] = {names.get(target, target) for target in targets}
+                for target in targets_by_symbol[symbol]:
+                    if target not in seen:
+                        seen.add(target)
+                        all_states.append(target)
+        if initial_state not in seen:
+            all_states.append(initial_state)
+        symbols = list(alphabet) + sorted({symbol for targets_by_symbol in moves.values()
+                                           for symbol in targets_by_symbol} - set(alphabet))
+        return cls(all_states, symbols, initial_state, final_states, moves)
+
+    @classmethod
+    def from_automaton(cls, automaton):
+        return cls.from_transitions(automaton.transitions, automaton.initial_state,
+                                    automaton.final_state_list(), automaton.states, automaton.alphabet)
+
+    def members(self, mask) -> []:
+        # Bit positions of a mask: sparse masks are peeled one low bit at a time, dense ones read from bin()
+        if mask.bit_count() <= 16:
+            positions = []
+            while mask:
+                low = mask & -mask
+                positions.append(low.bit_length() - 1)
+                mask ^= low
+            return positions
+        bits = bin(mask)[:1:-1]
+        positions = []
+        position = bits.find('1')
+        while position != -1:
+            positions.append(position)
+            position = bits.find('1', position + 1)
+        return positions
+
+    def step(self, mask, symbol) -> int:
+        row = self.moves.get(symbol)
+        if row is None:
+            return 0
+        target = 0
+        for position in self.members(mask):
+            target |= row[position]
+        return target
+
+    def determinize(self):
+        # Worklist subset construction, DFA states are bitmasks of NFA states
+        start = 1 << self.index[self.initial_state]
+        ids = {start: 0}
+        subsets = [start]
+        dfa_moves = []
+        rows = [(symbol, self.moves[symbol]) for symbol in self.alphabet]
+        for subset in subsets:
+            members = self.members(subset)
+            moves = {}
+            for symbol, row in rows:
+                target = 0
+                for position in members:
+                    target |= row[position]
+                if not target:
+                    continue
+                if target not in ids:
+                    ids[target] = len(subsets)
+                    subsets.append(target)
+                moves[symbol] = ids[target]
+            dfa_moves.append(moves)
+        return SubsetDFA(self, subsets, dfa_moves)
+
+
+class SubsetDFA:
+    # Result of TransitionModel.determinize: DFA state i is the set of NFA states subsets[i]
+
+    def __init__(self, nfa, subsets, moves):
+        self.nfa = nfa
+        self.subsets = subsets
+        self.moves = moves
+        self.accepting = [bool(subset & nfa.final_mask) for subset in subsets]
+
+    def state_names(self) -> []:
+        # Concatenated NFA state names, as nfa_to_dfa has always produced, unless two subsets would clash
+        names = ["".join(str(self.nfa.states[i]) for i in self.nfa.members(subset)) for subset in self.subsets]
+        if len(set(names)) < len(names):
+            names = ["{" + ",".join(str(self.nfa.states[i]) for i in self.nfa.members(subset)) + "}"
+                     for subset in self.subsets]
+        return names
+
+    def to_automaton(self, names=None) -> Automaton:
+        names = names or self.state_names()
+        dfa = Automaton()
+        dfa.states = list(names)
+        dfa.alphabet = list(self.nfa.alphabet)
+        dfa.initial_state = names[0]
+        dfa.final_states = [name for name, accepting in zip(names, self.accepting) if accepting]
+        dfa.transitions = {names[i]: [f"{symbol} {names[target]}" for symbol, target in moves.items()]
+                           for i, moves in enumerate(self.moves)}
+        return dfa
+
 
+class LazyState:
+
+    __slots__ = ("id", "mask", "accepting", "moves", "evicted")
+
+    def __init__(self, state_id, mask, accepting):
+        self.id = state_id
+        self.mask = mask
+        self.accepting = accepting
+        self.moves = {}
+        self.evicted = False
+
+
+class LazyDFA:
+    # Runs an NFA by materializing DFA states only when the input reaches them, like RE2's lazy DFA.
+    # States live in an LRU cache bounded by an estimate of their memory use. Evictions are counted over
+    # windows of thrash_window characters across calls; once a window sees more than thrash_ratio
+    # evictions per character the cache is thrashing, and whole inputs are simulated on NFA state sets
+    # without caching until probe_interval characters have gone by, when the cache is tried again.
+
+    STATE_OVERHEAD = 200
+    MOVE_OVERHEAD = 100
+
+    def __init__(self, automaton, memory_limit=1 << 20, thrash_ratio=0.1, thrash_window=1000,
+                 probe_interval=100000):
+        if isinstance(automaton, TransitionModel):
+            self.nfa = automaton
+        else:
+            self.nfa = TransitionModel.from_automaton(automaton)
+        self.memory_limit = memory_limit
+        self.thrash_ratio = thrash_ratio
+        self.thrash_window = thrash_window
+        self.probe_interval = probe_interval
+        self.start_mask = 1 << self.nfa.index[self.nfa.initial_state]
+        self.clear()
+
+    def clear(self):
+        self.cache = OrderedDict()
+        self.by_mask = {}
+        self.memory = 0
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fallbacks = 0
+        # Characters run through the cache, and the counters when the current window started
+        self.cached_chars = 0
+        self.window_chars = 0
+        self.window_evictions = 0
+        # Characters simulated since the cache was found thrashing, None while the cache is in use
+        self.simulated_chars = None
+
+    def stats(self) -> {}:
+        return {
+            "states": len(self.cache),
+            "memory": self.memory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "fallbacks": self.fallbacks,
+            "thrashing": self.simulated_chars is not None,
+        }
 
-automaton = Automaton()
-dfa = automaton.nfa_to_dfa()
-print(dfa.transitions)
-print(dfa.final_states)
-print(dfa.states)
-print(dfa.is_det())
-dfa.draw_automaton()
+    def state_for(self, mask) -> LazyState:
+        state = self.by_mask.get(mask)
+        if state is not None and not state.evicted:
+            self.cache.move_to_end(state.id)
+            return state
+        if state is None:
+            state = LazyState(self.next_id, mask, bool(mask & self.nfa.final_mask))
+            self.next_id += 1
+        state.evicted = False
+        self.by_mask[mask] = state
+        self.cache[state.id] = state
+        self.memory += sys.getsizeof(mask) + self.STATE_OVERHEAD
+        self.evict()
+        return state
+
+    def evict(self):
+        # The most recently used state is never evicted, so a run can always make progress
+        while self.memory > self.memory_limit and len(self.cache) > 1:
+            _, state = self.cache.popitem(last=False)
+            self.memory -= sys.getsizeof(state.mask) + self.STATE_OVERHEAD + self.MOVE_OVERHEAD * len(state.moves)
+            state.moves.clear()
+            state.evicted = True
+            del self.by_mask[state.mask]
+            self.evictions += 1
+
+    def thrashing(self, cached_chars) -> bool:
+        # Closes the current window once it is thrash_window characters long, reporting whether the
+        # cache evicted more than thrash_ratio states per character in it
+        seen = cached_chars - self.window_chars
+        if seen < self.thrash_window:
+            return False
+        thrashing = self.evictions - self.window_evictions > self.thrash_ratio * seen
+        self.window_chars, self.window_evictions = cached_chars, self.evictions
+        return thrashing
+
+    def accepts(self, input_string) -> bool:
+        if self.simulated_chars is not None:
+            self.fallbacks += 1
+            self.simulated_chars += len(input_string)
+            if self.simulated_chars >= self.probe_interval:
+                # Probe the cache again from the next input on, with a fresh window
+                self.simulated_chars = None
+                self.window_chars, self.window_evictions = self.cached_chars, self.evictions
+            return self.simulate(self.start_mask, input_string)
+
+        state = self.state_for(self.start_mask)
+        for position, symbol in enumerate(input_string):
+            target = state.moves.get(symbol)
+            if target is not None and not target.evicted:
+                self.hits += 1
+                self.cache.move_to_end(target.id)
+                state = target
+                continue
+
+            self.misses += 1
+            mask = self.nfa.step(state.mask, symbol)
+            if not mask:
+                self.cached_chars += position + 1
+                return False
+            target = self.state_for(mask)
+            if not state.evicted:
+                if symbol not in state.moves:
+                    self.memory += self.MOVE_OVERHEAD
+                state.moves[symbol] = target
+                # The new move counts against the limit as well, so evict again once it is recorded
+                self.evict()
+            state = target
+
+            if self.thrashing(self.cached_chars + position + 1):
+                self.cached_chars += position + 1
+                self.fallbacks += 1
+                self.simulated_chars = len(input_string) - position - 1
+                return self.simulate(state.mask, input_string[position + 1:])
+        self.cached_chars += len(input_string)
+        return state.accepting
+
+    def accepts_many(self, strings) -> []:
+        return [self.accepts(string) for string in strings]
+
+    def simulate(self, mask, input_string) -> bool:
+        # Plain NFA state set simulation, used once the cache thrashes
+        for symbol in input_string:
+            mask = self.nfa.step(mask, symbol)
+            if not mask:
+                return False
+        return bool(mask & self.nfa.final_mask)
+
+
+def random_nfa(state_count, alphabet=("a", "b"), branching=0.3, final_ratio=0.1, seed=None) -> Automaton:
+    # Two interchangeable copies of a random DFA: every move goes to either copy of its target, or to both,
+    # so the NFA is full of redundant states while its subset construction stays linear in size
+    rng = random.Random(seed)
+    base = max(1, state_count // 2)
+    nfa = Automaton()
+    nfa.states = [f"q{i}" for i in range(2 * base)]
+    nfa.alphabet = list(alphabet)
+    nfa.initial_state = nfa.states[0]
+    finals = [i for i in range(base) if rng.random() < final_ratio] or [base - 1]
+    nfa.final_states = [nfa.states[i] for i in finals] + [nfa.states[i + base] for i in finals]
+    moves = [[rng.randrange(base) for _ in alphabet] for _ in range(base)]
+    nfa.transitions = {}
+    for i, state in enumerate(nfa.states):
+        transitions = []
+        for symbol, target in zip(alphabet, moves[i % base]):
+            if rng.random() < branching:
+                transitions += [f"{symbol} {nfa.states[target]}", f"{symbol} {nfa.states[target + base]}"]
+            else:
+                transitions.append(f"{symbol} {nfa.states[target + rng.choice((0, base))]}")
+        nfa.transitions[state] = transitions
+    return nfa
+
+
+def benchmark_minimization(sizes=(100, 1000, 10000), string_count=2000, string_length=50, seed=0):
+    rng = random.Random(seed)
+    for size in sizes:
+        nfa = random_nfa(size, seed=rng.random())
+        dfa = TransitionModel.from_automaton(nfa).determinize().to_automaton()
+        start = time.perf_counter()
+        minimal = dfa.minimize()
+        minimize_time = time.perf_counter() - start
+
+        strings = ["".join(rng.choice(nfa.alphabet) for _ in range(string_length)) for _ in range(string_count)]
+        start = time.perf_counter()
+        before = dfa.accepts_many(strings)
+        before_time = time.perf_counter() - start
+        start = time.perf_counter()
+        after = minimal.accepts_many(strings)
+        after_time = time.perf_counter() - start
+        assert before == after
+
+        print(f"NFA states: {size:6d}  DFA states: {len(dfa.states):6d}  minimal states: {len(minimal.states):6d}  "
+              f"minimize: {minimize_time:.3f}s  "
+              f"membership: {string_count / before_time:9.0f}/s before, {string_count / after_time:9.0f}/s after")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the example NFA to a DFA and draw it.")
+    parser.add_argument('--benchmark', action='store_true', help="benchmark DFA minimization on random NFAs")
+    parser.add_argument('--dot', help="write the DFA as Graphviz DOT to this file instead of drawing it")
+    parser.add_argument('--svg', help="write the DFA as SVG to this file instead of drawing it")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_minimization()
+        return
+
+    automaton = Automaton()
+    dfa = automaton.nfa_to_dfa()
+    print(dfa.transitions)
+    print(dfa.final_states)
+    print(dfa.states)
+    print(dfa.is_det())
+    if args.dot or args.svg:
+        for path, export in ((args.dot, dfa.to_dot), (args.svg, dfa.to_svg)):
+            if path:
+                with open(path, 'w') as file:
+                    export(file)
+        return
+    dfa.draw_automaton()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,18 @@
+import argparse
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import json
+import os
+import random
 import re
+import sys
+import time
 
 
 class ArithmeticLexer:
-    def __init__(self):
+    def __init__(self, compiled=False):
         # Rules for the arithmetic expressions
         self.rules = [
             (r'[ \t]+', None),  # Ignore whitespace
@@ -17,7 +27,23 @@ class ArithmeticLexer:
         ]
         self.rules = [(re.compile(pattern), token_type) for (pattern, token_type) in self.rules]
 
+        # Compiled mode: all rules fused into one alternation with a named group per rule, tried in the
+        # same order, plus a catch-all group so every position matches and finditer never skips text
+        self.compiled = compiled
+        self.group_types = {f'RULE{i}': token_type for i, (_, token_type) in enumerate(self.rules)}
+        self.group_types['ILLEGAL'] = 'ILLEGAL'
+        alternatives = [f'(?P<RULE{i}>{pattern.pattern})' for i, (pattern, _) in enumerate(self.rules)]
+        self.master_pattern = re.compile('|'.join(alternatives + ['(?P<ILLEGAL>.)']), re.DOTALL)
+
+        # Token kinds are numbered for TokenBuffer, skipped rules have no kind
+        self.token_types = [token_type for (_, token_type) in self.rules if token_type] + ['ILLEGAL']
+        self.group_kinds = {group: (self.token_types.index(token_type) if token_type else None)
+                            for group, token_type in self.group_types.items()}
+
     def tokenize(self, text):
+        if self.compiled:
+            yield from self.tokenize_compiled(text)
+            return
         pos = 0
         while pos < len(text):
             match = None
@@ -35,6 +61,63 @@ class ArithmeticLexer:
             else:
                 pos = match.end(0)
 
+    def tokenize_compiled(self, text):
+        group_types = self.group_types
+        for match in self.master_pattern.finditer(text):
+            token_type = group_types[match.lastgroup]
+            if token_type:  # Ignore tokens like whitespace
+                yield (token_type, match.group())
+
+    def tokenize_spans(self, text):
+        # Lazily yields (token_type, start, end) without slicing the token text
+        group_types = self.group_types
+        for match in self.master_pattern.finditer(text):
+            token_type = group_types[match.lastgroup]
+            if token_type:
+                yield (token_type, match.start(), match.end())
+
+    def tokenize_buffer(self, text):
+        buffer = TokenBuffer(text, self.token_types)
+        kinds, starts, ends = buffer.kinds, buffer.starts, buffer.ends
+        group_kinds = self.group_kinds
+        for match in self.master_pattern.finditer(text):
+            kind = group_kinds[match.lastgroup]
+            if kind is not None:
+                kinds.append(kind)
+                start, end = match.span()
+                starts.append(start)
+                ends.append(end)
+        return buffer
+
+
+class TokenBuffer:
+    # Tokens of one text as parallel arrays of kind codes and offsets into the text (9 bytes per token),
+    # the (type, value) pairs the parser and validate_expression use are only built when indexed
+    def __init__(self, text, token_types):
+        self.text = text
+        self.token_types = token_types
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        return (self.token_types[self.kinds[index]], self.text[self.starts[index]:self.ends[index]])
+
+    def __iter__(self):
+        text = self.text
+        token_types = self.token_types
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            yield (token_types[kind], text[start:end])
+
+    def type_at(self, index):
+        return self.token_types[self.kinds[index]]
+
+    def value_at(self, index):
+        return self.text[self.starts[index]:self.ends[index]]
+
 
 def validate_expression(tokens):
     paren_stack = []
@@ -72,11 +155,433 @@ def validate_expression(tokens):
     return True, "Valid expression"
 
 
-# Example usage
-lexer = ArithmeticLexer()
-expression = '(3.14 + 2 * (1 - 5))'
-tokens = list(lexer.tokenize(expression))
-is_valid, message = validate_expression(tokens)
-print(f"Expression: {expression}")
-print(f"Tokens: {tokens}")
-print(f"Validation: {message}")
+def build_sequence_errors():
+    # (last token type, token type) -> message, the same sequence checks as validate_expression in one table
+    operators = ('PLUS', 'MINUS', 'MUL', 'DIV')
+    token_types = ('FLOAT', 'INTEGER', 'PLUS', 'MINUS', 'MUL', 'DIV', 'LPAREN', 'RPAREN', 'ILLEGAL')
+    errors = {}
+    for last_token_type in (None,) + token_types:
+        for token_type in token_types:
+            if last_token_type in operators and token_type in operators + ('RPAREN',):
+                errors[(last_token_type, token_type)] = "Invalid operator usage"
+            elif last_token_type == 'LPAREN' and token_type in operators + ('RPAREN',):
+                errors[(last_token_type, token_type)] = "Invalid expression after '('"
+            elif last_token_type in ('INTEGER', 'FLOAT', 'RPAREN') and token_type == 'LPAREN':
+                errors[(last_token_type, token_type)] = "Invalid expression before '('"
+    return errors
+
+
+SEQUENCE_ERRORS = build_sequence_errors()
+
+
+def utf8_offset(text, index, chunk_size=1 << 16):
+    # Byte offset of text[index] in the UTF-8 encoding of text, encoded a chunk at a time so the prefix
+    # is never copied whole
+    return sum(len(text[start:min(start + chunk_size, index)].encode('utf-8', 'surrogatepass'))
+               for start in range(0, index, chunk_size))
+
+
+def validate_stream(text, lexer=None):
+    # Same result as validate_expression plus the UTF-8 byte offset of the first error (the encoded length
+    # of text when the error is only found at the end), using a depth counter and consuming the tokens
+    # lazily in O(1) memory. Character and byte offsets differ once the text has non-ASCII characters,
+    # e.g. Unicode digits matched by \d.
+    lexer = lexer or ArithmeticLexer(compiled=True)
+    sequence_errors = SEQUENCE_ERRORS
+    depth = 0
+    last_token_type = None
+    for token_type, start, end in lexer.tokenize_spans(text):
+        if token_type == 'ILLEGAL':
+            return False, f"Illegal character found: {text[start:end]}", utf8_offset(text, start)
+        if token_type == 'LPAREN':
+            depth += 1
+        elif token_type == 'RPAREN':
+            if not depth:
+                return False, "Unbalanced parentheses", utf8_offset(text, start)
+            depth -= 1
+        message = sequence_errors.get((last_token_type, token_type))
+        if message:
+            return False, message, utf8_offset(text, start)
+        last_token_type = token_type
+    if depth:
+        return False, "Unbalanced parentheses", utf8_offset(text, len(text))
+    return True, "Valid expression", None
+
+
+def combine_summaries(first, second):
+    # Summary of two consecutive runs of tokens. A summary is (net, min_rparen, error, first type, last type):
+    # the paren depth change, the lowest depth relative to the start of the run seen before a ')', the
+    # first illegal or sequence error (min_rparen only covers the tokens up to it), and the types of the
+    # first and last token, so the pair across the boundary can be checked here. None is the empty run.
+    if first is None:
+        return second
+    if second is None:
+        return first
+    net, min_rparen, error, first_type, last_type = first
+    if error:
+        return first
+    second_net, second_min, second_error, second_first, second_last = second
+    boundary_error = SEQUENCE_ERRORS.get((last_type, second_first))
+    if boundary_error:
+        # The first token of the second run fails, after nothing but its own ')' check
+        second_min = 0 if second_first == 'RPAREN' else None
+        second_error = boundary_error
+    if second_min is not None and (min_rparen is None or net + second_min < min_rparen):
+        min_rparen = net + second_min
+    return net + second_net, min_rparen, second_error, first_type, second_last
+
+
+class TokenBlock:
+    # A slice of the text with the tokens in it (offsets relative to the slice) and the summary of
+    # validate_expression over them that does not depend on the paren depth. Blocks are the nodes of a
+    # treap in text order, and every node also keeps the text length and combined summary of its subtree.
+    __slots__ = ('text', 'kinds', 'starts', 'ends', 'summary', 'priority', 'left', 'right', 'length', 'total')
+
+    def __init__(self, text, tokens, offset, token_types):
+        self.text = text
+        self.kinds = array('B', [kind for kind, _, _ in tokens])
+        self.starts = array('I', [start - offset for _, start, _ in tokens])
+        self.ends = array('I', [end - offset for _, _, end in tokens])
+        self.summary = self.summarize(token_types)
+        self.priority = random.random()
+        self.left = self.right = None
+        self.length = len(text)
+        self.total = self.summary
+
+    def summarize(self, token_types):
+        if not self.kinds:
+            return None
+        depth = 0
+        min_rparen = None
+        error = None
+        last_token_type = None
+        for i, kind in enumerate(self.kinds):
+            token_type = token_types[kind]
+            if token_type == 'ILLEGAL':
+                error = f"Illegal character found: {self.text[self.starts[i]:self.ends[i]]}"
+                break
+            if token_type == 'LPAREN':
+                depth += 1
+            elif token_type == 'RPAREN':
+                if min_rparen is None or depth < min_rparen:
+                    min_rparen = depth
+                depth -= 1
+            error = SEQUENCE_ERRORS.get((last_token_type, token_type))
+            if error:
+                break
+            last_token_type = token_type
+        return depth, min_rparen, error, token_types[self.kinds[0]], token_types[self.kinds[-1]]
+
+    def update(self):
+        left, right = self.left, self.right
+        self.length = len(self.text)
+        self.total = self.summary
+        if left is not None:
+            self.length += left.length
+            self.total = combine_summaries(left.total, self.total)
+        if right is not None:
+            self.length += right.length
+            self.total = combine_summaries(self.total, right.total)
+
+    def tokens(self, offset=0):
+        return [(self.kinds[i], self.starts[i] + offset, self.ends[i] + offset) for i in range(len(self.kinds))]
+
+
+def merge_blocks(left, right):
+    # Treap of the blocks of left followed by those of right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = merge_blocks(left.right, right)
+        left.update()
+        return left
+    right.left = merge_blocks(left, right.left)
+    right.update()
+    return right
+
+
+def split_blocks(node, position):
+    # (blocks ending at or before position, the rest), position counted in characters from the start of node
+    if node is None:
+        return None, None
+    left_length = node.left.length if node.left is not None else 0
+    if position < left_length + len(node.text):
+        left, node.left = split_blocks(node.left, position)
+        node.update()
+        return left, node
+    node.right, right = split_blocks(node.right, position - left_length - len(node.text))
+    node.update()
+    return node, right
+
+
+def pop_first_block(node):
+    # (first block, treap of the others)
+    if node.left is None:
+        rest, node.right = node.right, None
+        node.update()
+        return node, rest
+    first, node.left = pop_first_block(node.left)
+    node.update()
+    return first, node
+
+
+def build_blocks(blocks):
+    # Treap of blocks already in text order, built in linear time on a stack holding its right spine
+    spine = []
+    for block in blocks:
+        child = None
+        while spine and spine[-1].priority < block.priority:
+            child = spine.pop()
+            child.update()
+        block.left = child
+        if spine:
+            spine[-1].right = block
+        spine.append(block)
+    while spine:
+        root = spine.pop()
+        root.update()
+    return root if blocks else None
+
+
+def iter_blocks(node):
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node
+        node = node.right
+
+
+class IncrementalValidator:
+    # Validates a text that is edited in place. The text is cut into blocks of about block_size tokens, each
+    # holding its own slice of the text, in a treap whose nodes combine the depth-independent summaries of
+    # their subtrees, so the summary at the root is the validation result. An edit re-lexes from the block
+    # holding the first token it can affect until the new tokens line up with the old ones again, replaces
+    # just those blocks and updates the O(log blocks) nodes above them; nothing past the edit is shifted.
+
+    LOOKAHEAD = 2  # characters past the end of a token the rules may read ('1' before '.5')
+
+    def __init__(self, text, lexer=None, block_size=64):
+        self.lexer = lexer or ArithmeticLexer(compiled=True)
+        self.block_size = block_size
+        buffer = self.lexer.tokenize_buffer(text)
+        self.root = build_blocks(self.make_blocks(text, list(zip(buffer.kinds, buffer.starts, buffer.ends))))
+
+    @property
+    def text(self):
+        return ''.join(block.text for block in iter_blocks(self.root))
+
+    def make_blocks(self, text, tokens):
+        # Cuts text and its tokens into blocks, each block's slice running up to the first token of the next
+        token_types = self.lexer.token_types
+        if not tokens:
+            return [TokenBlock(text, [], 0, token_types)] if text else []
+        blocks = []
+        for i in range(0, len(tokens), self.block_size):
+            offset = tokens[i][1] if i else 0
+            end = tokens[i + self.block_size][1] if i + self.block_size < len(tokens) else len(text)
+            blocks.append(TokenBlock(text[offset:end], tokens[i:i + self.block_size], offset, token_types))
+        return blocks
+
+    def validate(self):
+        summary = self.root.total if self.root is not None else None
+        if summary is None:
+            return True, "Valid expression"
+        net, min_rparen, error, _, _ = summary
+        # A ')' seen at depth 0 comes before, or at, the first other error
+        if min_rparen is not None and min_rparen <= 0:
+            return False, "Unbalanced parentheses"
+        if error:
+            return False, error
+        if net:
+            return False, "Unbalanced parentheses"
+        return True, "Valid expression"
+
+    def edit(self, start, end, replacement):
+        # Replaces text[start:end] with replacement and returns the new validation result
+        delta = len(replacement) - (end - start)
+        length = self.root.length if self.root is not None else 0
+
+        # Blocks before the one holding the first token whose lexing may have read the edited characters
+        left, rest = split_blocks(self.root, max(0, min(start - self.LOOKAHEAD, length - 1)))
+        window_start = left.length if left is not None else 0
+
+        # The window is the edited text of the blocks taken off the front of rest, in window coordinates
+        pieces = []
+        old_tokens = []
+        old_length = 0
+        while rest is not None and (not pieces or window_start + old_length < end):
+            block, rest = pop_first_block(rest)
+            pieces.append(block.text)
+            old_tokens += block.tokens(old_length)
+            old_length += len(block.text)
+        old_text = ''.join(pieces)
+        window = old_text[:start - window_start] + replacement + old_text[end - window_start:]
+        edit_end = start - window_start + len(replacement)
+
+        # Re-lex until a new token starts, ends and is of the same kind as an old token past the edit,
+        # taking in the next block whenever a match could still read past the end of the window
+        new_tokens = []
+        old_index = 0
+        position = 0
+        synced = False
+        group_kinds = self.lexer.group_kinds
+        while True:
+            extend = False
+            for match in self.lexer.master_pattern.finditer(window, position):
+                token_start, token_end = match.span()
+                if rest is not None and token_end + self.LOOKAHEAD > len(window):
+                    extend = True
+                    position = token_start
+                    break
+                kind = group_kinds[match.lastgroup]
+                if kind is None:
+                    continue
+                if token_start >= edit_end:
+                    while old_index < len(old_tokens) and old_tokens[old_index][1] < token_start - delta:
+                        old_index += 1
+                    if (old_index < len(old_tokens)
+                            and old_tokens[old_index] == (kind, token_start - delta, token_end - delta)):
+                        synced = True
+                        break
+                new_tokens.append((kind, token_start, token_end))
+            if not extend:
+                break
+            block, rest = pop_first_block(rest)
+            window += block.text
+            old_tokens += block.tokens(old_length)
+            old_length += len(block.text)
+
+        if synced:
+            new_tokens += [(kind, token_start + delta, token_end + delta)
+                           for kind, token_start, token_end in old_tokens[old_index:]]
+        rebuilt = build_blocks(self.make_blocks(window, new_tokens))
+        self.root = merge_blocks(merge_blocks(left, rebuilt), rest)
+        return self.validate()
+
+    def tokens(self):
+        token_types = self.lexer.token_types
+        for block in iter_blocks(self.root):
+            for kind, start, end in block.tokens():
+                yield (token_types[kind], block.text[start:end])
+
+
+def random_expression(size, seed=0):
+    # Builds an expression of roughly size characters out of numbers, operators and nested parentheses
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    depth = 0
+    while length < size:
+        if rng.random() < 0.2:
+            parts.append('(')
+            depth += 1
+        number = str(rng.randint(0, 999)) if rng.random() < 0.7 else f'{rng.randint(0, 99)}.{rng.randint(0, 99)}'
+        parts.append(number)
+        if depth and rng.random() < 0.2:
+            parts.append(')')
+            depth -= 1
+        parts.append(rng.choice([' + ', ' - ', ' * ', ' / ', '+', '*']))
+        length += len(number) + 4
+    parts.append('1' + ')' * depth)
+    return ''.join(parts)
+
+
+def benchmark_tokenize(size=4 * 1024 * 1024, repeat=3):
+    text = random_expression(size)
+    # A few illegal characters, to make sure both modes agree on them too
+    text = text[:1000] + ' $ ' + text[1000:] + ' ?'
+    reference = ArithmeticLexer()
+    compiled = ArithmeticLexer(compiled=True)
+    assert list(reference.tokenize(text)) == list(compiled.tokenize(text))
+    for name, lexer in (('rules', reference), ('compiled', compiled)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            count = sum(1 for _ in lexer.tokenize(text))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>8}: {len(text) / best / 1e6:6.2f} MB/s, {count / best / 1e6:5.2f} M tokens/s")
+
+
+_worker_lexer = None
+
+
+def _init_worker():
+    global _worker_lexer
+    _worker_lexer = ArithmeticLexer(compiled=True)
+
+
+def _validate_chunk(expressions):
+    # One JSON line per expression, joined so a whole chunk goes back to the parent as a single string
+    lines = []
+    for expression in expressions:
+        is_valid, message, byte_offset = validate_stream(expression, _worker_lexer)
+        lines.append(json.dumps({"valid": is_valid, "message": message, "byte_offset": byte_offset}))
+    return "\n".join(lines) + "\n"
+
+
+def validate_lines(lines, output, workers=None, chunk_size=10000, max_pending=None):
+    # Validates newline-delimited expressions on a process pool and writes JSONL results in input order.
+    # At most max_pending chunks are in flight, so the input is read only as fast as results are written.
+    expressions = (line.rstrip('\r\n') for line in lines)
+    chunks = iter(lambda: list(islice(expressions, chunk_size)), [])
+    if workers == 1:
+        _init_worker()
+        for chunk in chunks:
+            output.write(_validate_chunk(chunk))
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= max_pending:
+                output.write(pending.popleft().result())
+            pending.append(executor.submit(_validate_chunk, chunk))
+        while pending:
+            output.write(pending.popleft().result())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize and validate arithmetic expressions.")
+    parser.add_argument('--benchmark', action='store_true', help="compare lexer throughput on a large input")
+    parser.add_argument('--batch', help="file of newline-delimited expressions to validate, '-' for stdin")
+    parser.add_argument('--output', help="JSONL results file (defaults to stdout)")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="expressions per worker task")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_tokenize()
+        return
+
+    if args.batch:
+        source = sys.stdin if args.batch == '-' else open(args.batch)
+        output = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            validate_lines(source, output, args.workers, args.chunk_size)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if output is not sys.stdout:
+                output.close()
+        return
+
+    # Example usage
+    lexer = ArithmeticLexer()
+    expression = '(3.14 + 2 * (1 - 5))'
+    tokens = list(lexer.tokenize(expression))
+    is_valid, message = validate_expression(tokens)
+    print(f"Expression: {expression}")
+    print(f"Tokens: {tokens}")
+    print(f"Validation: {message}")
+
+
+if __name__ == '__main__':
+    main()
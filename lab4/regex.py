@@ -1,80 +1,19 @@
 import re
 import itertools
+import random
+from collections import OrderedDict, deque
 
 
 def generate_combinations(regex, limit=3):
-    def expand_group(part):
-        return part.strip('()').split('|')
-
-    quantifiers = {'*': (0, limit), '+': (1, limit), '?': (0, 1), '^': (1, 1)}
-
-    def expand_quantifiers(part):
-        if part[-1] in quantifiers:
-            base = part[-1]
-            min_rep, max_rep = quantifiers[part[-1]]
-            return [base * i for i in range(min_rep, max_rep + 1)]
-        elif part[-1] == '^':
-            base = part[:-1]
-            return [base * limit]
-        elif '{' in part and '}' in part:
-            base, quant = part.split('{')
-            min_rep, max_rep = map(int, quant.strip('}').split(','))
-            return [base * i for i in range(min_rep, max_rep + 1)]
-        else:
-            return [part]
-
-    parts = re.split(r'(\([^()]*\)|\[\^?.+?\]|\.\*|\.\+|\.\?|\.[\d*+]|\{[^\}]+\}|.)', regex)
-    parts = list(filter(None, parts))
-
-    expanded = []
-    for part in parts:
-        if '(' in part and ')' in part:
-            expanded.append(expand_group(part))
-        else:
-            expanded.append(expand_quantifiers(part))
-
-    combinations = list(itertools.product(*expanded))
-
-    strings = [''.join(combo) for combo in combinations]
-
-    results = []
-
-    for comb in strings:
-        base = ''
-        prev = ''
-        for chr in comb:
-            if chr == '+' or chr == '*':
-                base += base[-1]
-            elif chr == '?':
-                base = base[:-1]
-            elif prev == '^':
-                base = base[:-1] + base[len(base) - 2] * int(chr)
-            else:
-                base += chr
-
-            prev = chr
-
-        results.append(base)
+    # Every string of the regex with '*' and '+' repeated at most limit times, shortest first
+    return list(compile(regex, limit).combinations)
 
-    return results
 
+def process_regex(regex, limit=3):
+    return list(compile(regex, limit).steps)
 
-# Define regular expressions
-regex1 = '(a|b)(c|d)E+G?'
-regex2 = 'P(Q|R|S)T(UV|W|X)*Z+'
-regex3 = '1(0|1)*2(3|4)^536'
 
-# Generate combinations
-combinations1 = generate_combinations(regex1)
-combinations2 = generate_combinations(regex2)
-combinations3 = generate_combinations(regex3)
-
-print("Combinations for regex1:", list(set(combinations1)))
-print("Combinations for regex2:", list(set(combinations2)))
-print("Combinations for regex3:", list(set(combinations3)))
-
-
-def process_regex(regex):
+def describe_regex(regex, limit=3):
     steps = []
 
     def add_step(description):
@@ -99,15 +38,590 @@ def process_regex(regex):
                 add_step(f"Expanding '{base}' to repeat {limit} times")
             elif '{' in part and '}' in part:
                 base, quant = part.split('{')
-                min_rep, max_rep = map(int, quant.strip('}').split(','))
-                add_step(f"Expanding custom quantifier '{{{min_rep},{max_rep}}}' for base '{base}'")
+                # '{m}' repeats exactly m times, '{m,}' at least m times and '{m,n}' between m and n times
+                min_rep, comma, max_rep = quant.strip('}').partition(',')
+                bounds = f"{int(min_rep)},{int(max_rep) if max_rep else ''}" if comma else f"{int(min_rep)}"
+                add_step(f"Expanding custom quantifier '{{{bounds}}}' for base '{base}'")
             else:
                 add_step(f"Literal match for '{part}'")
 
     return steps
 
 
-# Example usage for regex1
-steps = process_regex(regex1)
-for step in steps:
-    print(step)
+class RegexNode:
+    pass
+
+
+class Literal(RegexNode):
+    def __init__(self, char):
+        self.char = char
+
+    def __repr__(self):
+        return f"Literal({self.char!r})"
+
+
+class Concat(RegexNode):
+    def __init__(self, items):
+        self.items = items
+
+    def __repr__(self):
+        return f"Concat({self.items})"
+
+
+class Alternation(RegexNode):
+    def __init__(self, options):
+        self.options = options
+
+    def __repr__(self):
+        return f"Alternation({self.options})"
+
+
+class Repeat(RegexNode):
+    # min_count to max_count copies of node, max_count None meaning unbounded
+    def __init__(self, node, min_count, max_count):
+        self.node = node
+        self.min_count = min_count
+        self.max_count = max_count
+
+    def __repr__(self):
+        return f"Repeat({self.node}, {self.min_count}, {self.max_count})"
+
+
+class RegexParser:
+    # Recursive descent over the lab's dialect:
+    #   alternation := concat ('|' concat)*
+    #   concat      := repeat*
+    #   repeat      := atom ('*' | '+' | '?' | '{m,n}' | '{m}' | '{m,}' | '^' count)*
+    #   atom        := '(' alternation ')' | '\\' char | char
+    # 'x^5' repeats x exactly five times (one digit), a bare '^' repeats it limit times.
+    special = set('()|*+?{}^\\')
+
+    def __init__(self, regex, limit=None):
+        self.regex = regex
+        self.limit = limit
+        self.pos = 0
+
+    def parse(self):
+        node = self.alternation()
+        if self.pos < len(self.regex):
+            raise ValueError(f"Unexpected '{self.regex[self.pos]}' at position {self.pos} in {self.regex!r}")
+        return node
+
+    def current(self):
+        if self.pos < len(self.regex):
+            return self.regex[self.pos]
+        return None
+
+    def eat(self, char):
+        if self.current() != char:
+            raise ValueError(f"Expected '{char}' at position {self.pos} in {self.regex!r}")
+        self.pos += 1
+
+    def alternation(self):
+        options = [self.concat()]
+        while self.current() == '|':
+            self.eat('|')
+            options.append(self.concat())
+        return options[0] if len(options) == 1 else Alternation(options)
+
+    def concat(self):
+        items = []
+        while self.current() is not None and self.current() not in '|)':
+            items.append(self.repeat())
+        return items[0] if len(items) == 1 else Concat(items)
+
+    def repeat(self):
+        node = self.atom()
+        while self.current() is not None and self.current() in '*+?{^':
+            quantifier = self.current()
+            self.pos += 1
+            if quantifier == '*':
+                node = Repeat(node, 0, None)
+            elif quantifier == '+':
+                node = Repeat(node, 1, None)
+            elif quantifier == '?':
+                node = Repeat(node, 0, 1)
+            elif quantifier == '^':
+                # The count after '^' is a single digit, '(3|4)^536' is (3|4) five times then '36'
+                count = None
+                if self.current() is not None and self.current().isdigit():
+                    count = int(self.current())
+                    self.pos += 1
+                if count is None:
+                    if self.limit is None:
+                        raise ValueError(f"'^' without a count needs a limit in {self.regex!r}")
+                    count = self.limit
+                node = Repeat(node, count, count)
+            else:
+                min_count = self.number()
+                max_count = min_count
+                if self.current() == ',':
+                    self.eat(',')
+                    max_count = self.number()
+                self.eat('}')
+                if min_count is None or (max_count is not None and max_count < min_count):
+                    raise ValueError(f"Invalid repetition at position {self.pos} in {self.regex!r}")
+                node = Repeat(node, min_count, max_count)
+        return node
+
+    def number(self):
+        start = self.pos
+        while self.current() is not None and self.current().isdigit():
+            self.pos += 1
+        return int(self.regex[start:self.pos]) if self.pos > start else None
+
+    def atom(self):
+        char = self.current()
+        if char == '(':
+            self.eat('(')
+            node = self.alternation()
+            self.eat(')')
+            return node
+        if char == '\\':
+            self.pos += 1
+            if self.current() is None:
+                raise ValueError(f"Dangling escape in {self.regex!r}")
+        elif char in self.special:
+            raise ValueError(f"Unexpected '{char}' at position {self.pos} in {self.regex!r}")
+        self.pos += 1
+        return Literal(self.regex[self.pos - 1])
+
+
+def parse_regex(regex, limit=None):
+    return RegexParser(regex, limit).parse()
+
+
+class ThompsonNFA:
+    # State i either reads chars[i] and moves to targets[i][0], or (chars[i] None) has epsilon moves to targets[i]
+    def __init__(self, node):
+        self.chars = []
+        self.targets = []
+        self.start, self.accept = self.build(node)
+
+    def add_state(self, char=None):
+        self.chars.append(char)
+        self.targets.append([])
+        return len(self.chars) - 1
+
+    def build(self, node):
+        # Returns the (start, end) states of a fragment, end has no outgoing moves yet
+        if isinstance(node, Literal):
+            start, end = self.add_state(node.char), self.add_state()
+            self.targets[start].append(end)
+            return start, end
+        if isinstance(node, Concat):
+            start = end = self.add_state()
+            for item in node.items:
+                item_start, item_end = self.build(item)
+                self.targets[end].append(item_start)
+                end = item_end
+            return start, end
+        if isinstance(node, Alternation):
+            start, end = self.add_state(), self.add_state()
+            for option in node.options:
+                option_start, option_end = self.build(option)
+                self.targets[start].append(option_start)
+                self.targets[option_end].append(end)
+            return start, end
+        # Repeat: min_count mandatory copies, then a starred copy or max_count - min_count optional ones
+        start = end = self.add_state()
+        for _ in range(node.min_count):
+            copy_start, copy_end = self.build(node.node)
+            self.targets[end].append(copy_start)
+            end = copy_end
+        if node.max_count is None:
+            loop_start, loop_end = self.build(node.node)
+            exit_state = self.add_state()
+            self.targets[end] += [loop_start, exit_state]
+            self.targets[loop_end] += [loop_start, exit_state]
+            return start, exit_state
+        exit_state = self.add_state()
+        for _ in range(node.max_count - node.min_count):
+            copy_start, copy_end = self.build(node.node)
+            self.targets[end] += [copy_start, exit_state]
+            end = copy_end
+        self.targets[end].append(exit_state)
+        return start, exit_state
+
+    def closure(self, states):
+        # Epsilon closure, keeping only the states that read a char plus the accepting state
+        stack = list(states)
+        seen = set(stack)
+        result = []
+        chars, targets, accept = self.chars, self.targets, self.accept
+        while stack:
+            state = stack.pop()
+            if chars[state] is not None or state == accept:
+                result.append(state)
+                continue
+            for target in targets[state]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        return result
+
+    def matches(self, text):
+        # Set simulation: linear in len(text) * number of states, no backtracking
+        chars, targets = self.chars, self.targets
+        current = self.closure([self.start])
+        for char in text:
+            current = self.closure([targets[state][0] for state in current if chars[state] == char])
+            if not current:
+                return False
+        return self.accept in current
+
+
+def compile_nfa(regex, limit=None):
+    return ThompsonNFA(parse_regex(regex, limit))
+
+
+def bound_repeats(node, limit):
+    # Caps unbounded repetitions at limit copies, the way generate_combinations expands '*' and '+'
+    if isinstance(node, Concat):
+        return Concat([bound_repeats(item, limit) for item in node.items])
+    if isinstance(node, Alternation):
+        return Alternation([bound_repeats(option, limit) for option in node.options])
+    if isinstance(node, Repeat):
+        max_count = node.max_count if node.max_count is not None else max(node.min_count, limit)
+        return Repeat(bound_repeats(node.node, limit), node.min_count, max_count)
+    return node
+
+
+class RegexDFA:
+    # Subset construction over the epsilon closures of a ThompsonNFA, trimmed to the states from which an
+    # accepting state can still be reached, so every path that is explored leads to a string
+    def __init__(self, nfa):
+        self.alphabet = sorted({char for char in nfa.chars if char is not None})
+        start = frozenset(nfa.closure([nfa.start]))
+        ids = {start: 0}
+        subsets = [start]
+        self.moves = []
+        for subset in subsets:
+            moves = {}
+            for symbol in self.alphabet:
+                targets = frozenset(nfa.closure([nfa.targets[state][0] for state in subset
+                                                 if nfa.chars[state] == symbol]))
+                if not targets:
+                    continue
+                if targets not in ids:
+                    ids[targets] = len(subsets)
+                    subsets.append(targets)
+                moves[symbol] = ids[targets]
+            self.moves.append(moves)
+        self.accepting = [nfa.accept in subset for subset in subsets]
+        self.start = 0
+        self.trim()
+
+    def trim(self):
+        predecessors = [[] for _ in self.moves]
+        for state, moves in enumerate(self.moves):
+            for target in moves.values():
+                predecessors[target].append(state)
+        live = {state for state, accepting in enumerate(self.accepting) if accepting}
+        queue = deque(live)
+        while queue:
+            for source in predecessors[queue.popleft()]:
+                if source not in live:
+                    live.add(source)
+                    queue.append(source)
+        self.moves = [{symbol: target for symbol, target in moves.items() if target in live}
+                      if state in live else {} for state, moves in enumerate(self.moves)]
+        self.live = live
+
+    def matches(self, text):
+        state = self.start
+        for char in text:
+            state = self.moves[state].get(char)
+            if state is None:
+                return False
+        return self.accepting[state]
+
+
+def compile_dfa(regex, limit=None):
+    node = parse_regex(regex, limit)
+    if limit is not None:
+        node = bound_repeats(node, limit)
+    return RegexDFA(ThompsonNFA(node))
+
+
+class LanguageEnumerator:
+    # Yields the distinct strings of a DFA's language lazily, shortest first and in code point order within
+    # one length. Strings of length n are found depth first, pruned with the set of states that reach an
+    # accepting state in exactly r more steps, so memory grows with n and the DFA size, not the output.
+    def __init__(self, dfa):
+        self.dfa = dfa
+        self.sorted_moves = [sorted(moves.items()) for moves in dfa.moves]
+        self.predecessors = [[] for _ in dfa.moves]
+        for state, moves in enumerate(dfa.moves):
+            for target in moves.values():
+                self.predecessors[target].append(state)
+        self.reach = [frozenset(state for state in dfa.live if dfa.accepting[state])]
+
+    def reach_in(self, steps):
+        while len(self.reach) <= steps:
+            previous = self.reach[-1]
+            self.reach.append(frozenset(source for state in previous for source in self.predecessors[state]))
+        return self.reach[steps]
+
+    def strings_of_length(self, length):
+        if self.dfa.start not in self.reach_in(length):
+            return
+        path = []
+        stack = [iter(self.sorted_moves[self.dfa.start])]
+        while stack:
+            remaining = length - len(path)
+            if remaining == 0:
+                yield ''.join(path)
+            else:
+                reach = self.reach[remaining - 1]
+                for symbol, target in stack[-1]:
+                    if target in reach:
+                        path.append(symbol)
+                        stack.append(iter(self.sorted_moves[target]))
+                        break
+                else:
+                    remaining = 0
+            if remaining == 0:
+                stack.pop()
+                if path:
+                    path.pop()
+
+    def __iter__(self):
+        length = 0
+        # Once no state reaches an accepting one in exactly n steps, no longer string exists either
+        while self.reach_in(length):
+            yield from self.strings_of_length(length)
+            length += 1
+
+    def take(self, count, offset=0):
+        return list(itertools.islice(iter(self), offset, offset + count))
+
+
+def enumerate_strings(regex, limit=None):
+    return LanguageEnumerator(compile_dfa(regex, limit))
+
+
+class LanguageCounter:
+    # counts[n][state] is the number of distinct strings of length n accepted from state, filled in by
+    # dynamic programming over the DFA; the tables are kept, so sampling another string costs O(n)
+    def __init__(self, dfa):
+        self.dfa = dfa
+        self.sorted_moves = [sorted(moves.items()) for moves in dfa.moves]
+        self.counts = [[1 if accepting else 0 for accepting in dfa.accepting]]
+
+    def counts_for(self, length):
+        while len(self.counts) <= length:
+            previous = self.counts[-1]
+            self.counts.append([sum(previous[target] for _, target in moves) for moves in self.sorted_moves])
+        return self.counts[length]
+
+    def count(self, length):
+        return self.counts_for(length)[self.dfa.start]
+
+    def count_up_to(self, max_length):
+        return [self.count(length) for length in range(max_length + 1)]
+
+    def sample(self, length, rng=random):
+        # Uniform over the strings of the given length: each symbol is picked in proportion to the number
+        # of accepted completions behind it
+        self.counts_for(length)
+        state = self.dfa.start
+        if not self.counts[length][state]:
+            raise ValueError(f"The language has no strings of length {length}")
+        chars = []
+        for remaining in range(length, 0, -1):
+            pick = rng.randrange(self.counts[remaining][state])
+            following = self.counts[remaining - 1]
+            for symbol, target in self.sorted_moves[state]:
+                if pick < following[target]:
+                    break
+                pick -= following[target]
+            chars.append(symbol)
+            state = target
+        return ''.join(chars)
+
+
+def count_strings(regex, max_length, limit=None):
+    return LanguageCounter(compile_dfa(regex, limit)).count_up_to(max_length)
+
+
+def sample_strings(regex, length, count=1, limit=None, seed=None):
+    counter = LanguageCounter(compile_dfa(regex, limit))
+    rng = random.Random(seed)
+    return [counter.sample(length, rng) for _ in range(count)]
+
+
+def dfa_step(dfa, state, symbol):
+    # Missing moves lead to a dead state, represented by None
+    return None if state is None else dfa.moves[state].get(symbol)
+
+
+def dfa_accepts(dfa, state):
+    return state is not None and dfa.accepting[state]
+
+
+def shortest_difference(dfa1, dfa2, differs):
+    # Breadth-first search over the product automaton for the shortest string whose pair of end states
+    # satisfies differs(accepted by dfa1, accepted by dfa2)
+    alphabet = sorted(set(dfa1.alphabet) | set(dfa2.alphabet))
+    start = (dfa1.start, dfa2.start)
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        pair = queue.popleft()
+        if differs(dfa_accepts(dfa1, pair[0]), dfa_accepts(dfa2, pair[1])):
+            chars = []
+            while parents[pair] is not None:
+                pair, symbol = parents[pair]
+                chars.append(symbol)
+            return ''.join(reversed(chars))
+        for symbol in alphabet:
+            target = (dfa_step(dfa1, pair[0], symbol), dfa_step(dfa2, pair[1], symbol))
+            if target != (None, None) and target not in parents:
+                parents[target] = (pair, symbol)
+                queue.append(target)
+    return None
+
+
+def equivalent_dfas(dfa1, dfa2):
+    # Hopcroft-Karp: merge the classes of paired states with union-find and follow every symbol from each
+    # newly merged pair; the languages differ exactly when a merged pair disagrees on acceptance
+    alphabet = sorted(set(dfa1.alphabet) | set(dfa2.alphabet))
+    parent = {}
+
+    def find(node):
+        root = node
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while node != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    parent[(1, dfa1.start)] = (2, dfa2.start)
+    queue = deque([(dfa1.start, dfa2.start)])
+    while queue:
+        state1, state2 = queue.popleft()
+        if dfa_accepts(dfa1, state1) != dfa_accepts(dfa2, state2):
+            return False
+        for symbol in alphabet:
+            target1, target2 = dfa_step(dfa1, state1, symbol), dfa_step(dfa2, state2, symbol)
+            root1, root2 = find((1, target1)), find((2, target2))
+            if root1 != root2:
+                parent[root1] = root2
+                queue.append((target1, target2))
+    return True
+
+
+def equivalent(regex1, regex2, limit=None):
+    # (True, None) when both regexes accept the same language, else (False, shortest string accepted by
+    # exactly one of them); limit caps '*' and '+' like generate_combinations does
+    dfa1, dfa2 = compile_dfa(regex1, limit), compile_dfa(regex2, limit)
+    if equivalent_dfas(dfa1, dfa2):
+        return True, None
+    return False, shortest_difference(dfa1, dfa2, lambda accepted1, accepted2: accepted1 != accepted2)
+
+
+def is_included(regex1, regex2, limit=None):
+    # (True, None) when every string of regex1 is accepted by regex2, else (False, shortest one that is not)
+    dfa1, dfa2 = compile_dfa(regex1, limit), compile_dfa(regex2, limit)
+    counterexample = shortest_difference(dfa1, dfa2, lambda accepted1, accepted2: accepted1 and not accepted2)
+    return counterexample is None, counterexample
+
+
+class CompiledRegex:
+    # Everything derived from one (regex, limit) pair: the AST, the matching NFA, the DFA with repetitions
+    # capped at limit (uncapped when limit is None) and, built on first use, its processing steps,
+    # strings, counts and sampler
+    def __init__(self, regex, limit=3):
+        self.regex = regex
+        self.limit = limit
+        self.ast = parse_regex(regex, limit)
+        self.nfa = ThompsonNFA(self.ast)
+        self.dfa = RegexDFA(ThompsonNFA(self.ast if limit is None else bound_repeats(self.ast, limit)))
+        self._steps = None
+        self._combinations = None
+        self._counter = None
+
+    @property
+    def steps(self):
+        if self._steps is None:
+            self._steps = tuple(describe_regex(self.regex, self.limit))
+        return self._steps
+
+    @property
+    def combinations(self):
+        if self._combinations is None:
+            self._combinations = tuple(LanguageEnumerator(self.dfa))
+        return self._combinations
+
+    @property
+    def counter(self):
+        if self._counter is None:
+            self._counter = LanguageCounter(self.dfa)
+        return self._counter
+
+    def matches(self, text):
+        return self.nfa.matches(text)
+
+
+class RegexCache:
+    # Size-bounded LRU cache of CompiledRegex objects keyed by (regex, limit)
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, regex, limit):
+        key = (regex, limit)
+        compiled = self.entries.get(key)
+        if compiled is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return compiled
+        self.misses += 1
+        compiled = CompiledRegex(regex, limit)
+        self.entries[key] = compiled
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return compiled
+
+    def stats(self):
+        return {"size": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+regex_cache = RegexCache()
+
+
+def compile(regex, limit=3):
+    return regex_cache.get(regex, limit)
+
+
+def main():
+    # Define regular expressions
+    regex1 = '(a|b)(c|d)E+G?'
+    regex2 = 'P(Q|R|S)T(UV|W|X)*Z+'
+    regex3 = '1(0|1)*2(3|4)^536'
+
+    # Generate combinations
+    combinations1 = generate_combinations(regex1)
+    combinations2 = generate_combinations(regex2)
+    combinations3 = generate_combinations(regex3)
+
+    print("Combinations for regex1:", list(set(combinations1)))
+    print("Combinations for regex2:", list(set(combinations2)))
+    print("Combinations for regex3:", list(set(combinations3)))
+
+    # Example usage for regex1
+    steps = process_regex(regex1)
+    for step in steps:
+        print(step)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,10 @@
+import argparse
+import itertools
+import random
+import time
+from collections import deque
+
+
 class Grammar:
     def __init__(self, variables, terminals, productions, start_symbol):
         self.variables = variables
@@ -17,134 +24,866 @@ class Grammar:
         return result
 
     def generate_strings_with_letter_removed(self, s, letter):
+        # Every way of dropping at least one occurrence of letter, each subset of occurrences taken once
+        parts = s.split(letter)
         strings = []
-        count_b = s.count('B')
-        for i in range(0, len(s)):
-            if s[i] == letter:
-                string = s[0:i] + s[i + 1:]
-                strings.append(string)
-                strings += self.generate_strings_with_letter_removed(string, letter)
+        for kept in itertools.product((letter, ""), repeat=len(parts) - 1):
+            if "" in kept:
+                strings.append(parts[0] + "".join(symbol + part for symbol, part in zip(kept, parts[1:])))
         return strings
 
     def remove_empty_string(self):
-        empty_symbols = []
-        for symbol in self.productions:
-            for transition in self.productions[symbol]:
-                if transition == "":
-                    if symbol not in empty_symbols:
-                        empty_symbols.append(symbol)
-            self.productions[symbol] = list(filter(lambda x: len(x) > 0, self.productions[symbol]))
-
-        for empty_symbol in empty_symbols:
-            for symbol in self.productions:
-                transitions_to_change = []
-                for transition in self.productions[symbol]:
-                    if empty_symbol in transition:
-                        transitions_to_change.append(transition)
-
-                append_to_productions = []
-                for trns in transitions_to_change:
-                    append_to_productions += self.generate_strings_with_letter_removed(trns, empty_symbol)
-
-                self.productions[symbol] += append_to_productions
-                self.productions[symbol] = self.remove_duplicates(self.productions[symbol])
+        grammar = IndexedGrammar.from_grammar(self)
+        grammar.remove_empty_rules()
+        grammar.write_to(self)
 
     def remove_inaccessible(self):
-        reachable_symbols = [self.start_symbol]
-        while True:
-            symbol = reachable_symbols[len(reachable_symbols) - 1]
-            found_something = False
-            for trns in self.productions[symbol]:
-                for i in trns:
-                    if i in self.variables:
-                        if i not in reachable_symbols:
-                            found_something = True
-                            reachable_symbols.append(i)
-
-            if not found_something:
-                break
+        grammar = IndexedGrammar.from_grammar(self)
+        grammar.remove_inaccessible()
+        grammar.write_to(self)
 
-        unreachable_symbols = []
-        for i in self.variables:
-            if i not in reachable_symbols:
-                unreachable_symbols.append(i)
-        for i in self.variables:
-            if len(self.productions[i]) == 0 and i not in unreachable_symbols:
-                unreachable_symbols.append(i)
+    def eliminate_unit_productions(self):
+        grammar = IndexedGrammar.from_grammar(self)
+        grammar.eliminate_unit_rules()
+        grammar.write_to(self)
+
+    def convert_to_chomsky_normal_form(self):
+        grammar = IndexedGrammar.from_grammar(self)
+        grammar.convert_to_chomsky_normal_form()
+        grammar.write_to(self)
 
-        for symbol in self.productions:
-            for idx in range(0, len(self.productions[symbol])):
-                for i in unreachable_symbols:
-                    self.productions[symbol][idx] = self.productions[symbol][idx].replace(i, "")
+    def transform_to_chomsky_normal_form(self):
+        grammar = IndexedGrammar.from_grammar(self)
+        grammar.simplify()
+        print(grammar.to_productions())
+        grammar.convert_to_chomsky_normal_form()
+        grammar.write_to(self)
+        print(self.productions)
 
-        for i in unreachable_symbols:
-            del self.productions[i]
-            self.variables.remove(i)
 
-    def eliminate_unit_productions(self):
-        while True:
-            found_something = False
-            for symbol in self.productions:
-                for idx in range(0, len(self.productions[symbol])):
-                    trns = self.productions[symbol][idx]
-                    if len(trns) == 1 and trns in self.variables:
-                        found_something = True
-                        self.productions[symbol].pop(idx)
-                        self.productions[symbol] += self.productions[trns]
-            if not found_something:
-                break
+class IndexedGrammar:
+    # The grammar with every symbol interned to an integer and right-hand sides stored as tuples of ids.
+    # rules_by_head[A] maps each right-hand side of A to its rule id (which also removes duplicates) and
+    # occurrences[X] holds the ids of the rules whose right-hand side contains X, so a pass only visits the
+    # rules it changes instead of rescanning every production string.
+    lambda_symbol = "ε"
 
-    def convert_to_chomsky_normal_form(self):
-        lambda_symbol = "ε"
-        new_nonterminals = {}
-        k = 1
-        for symbol in self.productions:
-            for idx in range(0, len(self.productions[symbol])):
-                trns = self.productions[symbol][idx]
-                if len(trns) >= 2:
-                    if len(trns) == 2:
-                        cnt_nonterm = 0
-                        for i in trns:
-                            if i in self.variables:
-                                cnt_nonterm += 1
-                        if cnt_nonterm == 2:
-                            continue
-
-                    rest = self.productions[symbol][idx][1:]
-                    nonterm_found = ""
-                    for i in new_nonterminals:
-                        if rest == new_nonterminals[i]:
-                            nonterm_found = i
-                            break
-                    if nonterm_found == "":
-                        new_nonterminals[lambda_symbol + str(k)] = rest
-                        nonterm_found = lambda_symbol + str(k)
-                        k += 1
-                    self.productions[symbol][idx] = self.productions[symbol][idx].replace(rest, nonterm_found)
-
-                    if self.productions[symbol][idx][0] in self.terminals:
-                        term = self.productions[symbol][idx][0]
-                        nonterm_found = ""
-                        for i in new_nonterminals:
-                            if term == new_nonterminals[i]:
-                                nonterm_found = i
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+        self.variable = []
+        self.start = None
+        self.rules = []
+        self.rules_by_head = []
+        self.occurrences = []
+        self.next_helper = 1
+        self.longest_name = 1
+
+    def add_symbol(self, name, variable):
+        if name in self.ids:
+            return self.ids[name]
+        symbol = len(self.names)
+        self.ids[name] = symbol
+        self.names.append(name)
+        self.longest_name = max(self.longest_name, len(name))
+        self.variable.append(variable)
+        self.rules_by_head.append({})
+        self.occurrences.append(set())
+        return symbol
+
+    def add_helper(self):
+        # New nonterminals are named ε1, ε2, ... like convert_to_chomsky_normal_form has always done
+        while self.lambda_symbol + str(self.next_helper) in self.ids:
+            self.next_helper += 1
+        name = self.lambda_symbol + str(self.next_helper)
+        self.next_helper += 1
+        return self.add_symbol(name, True)
+
+    def add_rule(self, head, body):
+        if body in self.rules_by_head[head]:
+            return self.rules_by_head[head][body]
+        rule = len(self.rules)
+        self.rules.append((head, body))
+        self.rules_by_head[head][body] = rule
+        for symbol in set(body):
+            self.occurrences[symbol].add(rule)
+        return rule
+
+    def remove_rule(self, rule):
+        head, body = self.rules[rule]
+        del self.rules_by_head[head][body]
+        for symbol in set(body):
+            self.occurrences[symbol].discard(rule)
+        self.rules[rule] = None
+
+    def remove_symbol(self, symbol):
+        # Drops the rules of a symbol and every rule that uses it
+        for rule in list(self.rules_by_head[symbol].values()) + list(self.occurrences[symbol]):
+            if self.rules[rule] is not None:
+                self.remove_rule(rule)
+
+    def heads(self):
+        return [symbol for symbol in range(len(self.names)) if self.variable[symbol] and self.rules_by_head[symbol]]
+
+    @classmethod
+    def from_grammar(cls, grammar):
+        indexed = cls()
+        for name in sorted(grammar.variables):
+            indexed.add_symbol(name, True)
+        for name in sorted(grammar.terminals):
+            indexed.add_symbol(name, False)
+        indexed.start = indexed.add_symbol(grammar.start_symbol, True)
+        for head, bodies in grammar.productions.items():
+            head = indexed.add_symbol(head, True)
+            if isinstance(bodies, str):
+                bodies = [bodies]
+            for body in bodies:
+                indexed.add_rule(head, indexed.split(body))
+        return indexed
+
+    def split(self, body):
+        # Longest match against the known symbol names, so multi-character nonterminals such as ε1 stay whole;
+        # "" and a lone "ε" stand for the empty string
+        if body in ("", self.lambda_symbol):
+            return ()
+        symbols = []
+        pos = 0
+        while pos < len(body):
+            for end in range(min(len(body), pos + self.longest_name), pos, -1):
+                if body[pos:end] in self.ids:
+                    symbols.append(self.ids[body[pos:end]])
+                    pos = end
+                    break
+            else:
+                symbols.append(self.add_symbol(body[pos], False))
+                pos += 1
+        return tuple(symbols)
+
+    def to_productions(self):
+        productions = {}
+        for head in self.heads():
+            productions[self.names[head]] = ["".join(self.names[symbol] for symbol in body) or self.lambda_symbol
+                                             for body in self.rules_by_head[head]]
+        return productions
+
+    def write_to(self, grammar):
+        grammar.productions = self.to_productions()
+        grammar.variables = {self.names[head] for head in self.heads()}
+        grammar.terminals = {self.names[symbol] for symbol in range(len(self.names))
+                             if not self.variable[symbol] and self.occurrences[symbol]}
+
+    def derivable_symbols(self, seeds=()):
+        # Worklist fixpoint: remaining[rule] counts the symbols of the rule not yet in the set, and the head
+        # joins the set when it drops to zero, so every occurrence is visited once
+        remaining = {}
+        found = set(seeds)
+        queue = deque(found)
+        for rule, entry in enumerate(self.rules):
+            if entry is None:
+                continue
+            head, body = entry
+            remaining[rule] = len(body)
+            if not body and head not in found:
+                found.add(head)
+                queue.append(head)
+        while queue:
+            symbol = queue.popleft()
+            for rule in self.occurrences[symbol]:
+                head, body = self.rules[rule]
+                remaining[rule] -= body.count(symbol)
+                if remaining[rule] == 0 and head not in found:
+                    found.add(head)
+                    queue.append(head)
+        return found
+
+    def nullable_symbols(self):
+        return self.derivable_symbols()
+
+    def generating_symbols(self):
+        return self.derivable_symbols(symbol for symbol in range(len(self.names)) if not self.variable[symbol])
+
+    def reachable_symbols(self):
+        reachable = {self.start}
+        queue = deque([self.start])
+        while queue:
+            for body in self.rules_by_head[queue.popleft()]:
+                for symbol in body:
+                    if symbol not in reachable:
+                        reachable.add(symbol)
+                        queue.append(symbol)
+        return reachable
+
+    @staticmethod
+    def without_nullable(body, nullable):
+        # Each subset of the nullable occurrences is dropped exactly once
+        choices = [((symbol,), ()) if symbol in nullable else ((symbol,),) for symbol in body]
+        for combination in itertools.product(*choices):
+            yield tuple(symbol for part in combination for symbol in part)
+
+    def remove_empty_rules(self):
+        # Every nullable symbol, including the ones that only derive the empty string through other variables,
+        # is dropped from the rules that use it in every combination; the empty rules themselves go away
+        nullable = self.nullable_symbols()
+        for symbol in nullable:
+            if () in self.rules_by_head[symbol]:
+                self.remove_rule(self.rules_by_head[symbol][()])
+        affected = set()
+        for symbol in nullable:
+            affected.update(self.occurrences[symbol])
+        for rule in sorted(affected):
+            head, body = self.rules[rule]
+            for reduced in self.without_nullable(body, nullable):
+                if reduced:
+                    self.add_rule(head, reduced)
+
+    def remove_inaccessible(self):
+        # Symbols that derive no terminal string go first, together with every rule that uses them, and then
+        # everything the start symbol can no longer reach; the start symbol itself is always kept
+        generating = self.generating_symbols()
+        generating.add(self.start)
+        for symbol in range(len(self.names)):
+            if symbol not in generating:
+                self.remove_symbol(symbol)
+        reachable = self.reachable_symbols()
+        for symbol in range(len(self.names)):
+            if symbol not in reachable:
+                self.remove_symbol(symbol)
+
+    def unit_components(self, unit_targets):
+        # Tarjan's algorithm without recursion; components come out sinks first, so every component
+        # a unit rule leads to is finished before the component it leaves
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        components = []
+        for root in unit_targets:
+            if root in index:
+                continue
+            work = [(root, iter(unit_targets[root]))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                symbol, targets = work[-1]
+                for target in targets:
+                    if target not in index:
+                        index[target] = low[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(unit_targets[target])))
+                        break
+                    if target in on_stack:
+                        low[symbol] = min(low[symbol], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        low[work[-1][0]] = min(low[work[-1][0]], low[symbol])
+                    if low[symbol] == index[symbol]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == symbol:
                                 break
-                        if nonterm_found == "":
-                            new_nonterminals[lambda_symbol + str(k)] = term
-                            nonterm_found = lambda_symbol + str(k)
-                            k += 1
-                        self.productions[symbol][idx] = self.productions[symbol][idx].replace(term, nonterm_found)
+                        components.append(component)
+        return components
 
-        self.productions.update(new_nonterminals)
+    def eliminate_unit_rules(self):
+        # A -> B rules are replaced by the non-unit rules of every variable reachable from A through unit rules.
+        # Variables on a unit cycle reach exactly the same variables, so the set of non-unit bodies is collected
+        # once per strongly connected component of the unit graph, from the sink components upwards
+        unit_targets = {}
+        for head in self.heads():
+            unit_targets[head] = [body[0] for body in self.rules_by_head[head]
+                                  if len(body) == 1 and self.variable[body[0]]]
+        for head in list(unit_targets):
+            for target in unit_targets[head]:
+                unit_targets.setdefault(target, [])
+        component_of = {}
+        closures = []
+        for number, component in enumerate(self.unit_components(unit_targets)):
+            for member in component:
+                component_of[member] = number
+            closure = set()
+            below = set()
+            for member in component:
+                closure.update(body for body in self.rules_by_head[member]
+                               if not (len(body) == 1 and self.variable[body[0]]))
+                below.update(component_of[target] for target in unit_targets[member])
+            below.discard(number)
+            for other in below:
+                closure |= closures[other]
+            closures.append(closure)
+            if len(component) > 1 or below:
+                for member in component:
+                    for body in closure:
+                        self.add_rule(member, body)
+        for head, targets in unit_targets.items():
+            for target in targets:
+                self.remove_rule(self.rules_by_head[head][(target,)])
 
-    def transform_to_chomsky_normal_form(self):
-        self.remove_empty_string()
+    def simplify(self):
+        self.remove_empty_rules()
         self.remove_inaccessible()
-        self.eliminate_unit_productions()
+        self.eliminate_unit_rules()
         self.remove_inaccessible()
-        print(self.productions)
+        return self
+
+    def normalize(self):
+        self.simplify()
         self.convert_to_chomsky_normal_form()
-        print(self.productions)
+        return self
+
+    def convert_to_chomsky_normal_form(self):
+        # Terminals inside longer rules get a helper X -> a and long rules become chains of binary rules;
+        # helpers are shared between rules through the terminal_helpers and suffix_helpers maps
+        terminal_helpers = {}
+        suffix_helpers = {}
+        pending = [(head, body) for head in self.heads() for body in self.rules_by_head[head]]
+
+        def helper_for(body):
+            table = terminal_helpers if len(body) == 1 else suffix_helpers
+            if body not in table:
+                table[body] = self.add_helper()
+                pending.append((table[body], body))
+            return table[body]
+
+        def variable_for(symbol):
+            return symbol if self.variable[symbol] else helper_for((symbol,))
+
+        while pending:
+            head, body = pending.pop()
+            if len(body) < 2 or (len(body) == 2 and self.variable[body[0]] and self.variable[body[1]]):
+                self.add_rule(head, body)
+                continue
+            if body in self.rules_by_head[head]:
+                self.remove_rule(self.rules_by_head[head][body])
+            rest = variable_for(body[1]) if len(body) == 2 else helper_for(body[1:])
+            self.add_rule(head, (variable_for(body[0]), rest))
+
+
+class CYKParser:
+    # CYK over a grammar in Chomsky normal form. The chart holds one int per (span length, variable) whose
+    # bit i says that the variable derives the span starting at i, so for a binary rule A -> BC and a split
+    # point every start position is handled by one AND of two ints. Binary rules are grouped by their
+    # (B, C) pair and right_of[B] lists (C, heads) for the pairs that start with B.
+    def __init__(self, grammar):
+        if isinstance(grammar, Grammar):
+            grammar = IndexedGrammar.from_grammar(grammar)
+        self.grammar = grammar
+        self.variables = grammar.heads()
+        self.number = {symbol: number for number, symbol in enumerate(self.variables)}
+        self.accepts_empty = () in grammar.rules_by_head[grammar.start]
+        self.terminal_heads = {}
+        self.pairs = {}
+        self.pairs_of = {}
+        for head in self.variables:
+            for body in grammar.rules_by_head[head]:
+                if len(body) == 1 and not grammar.variable[body[0]]:
+                    self.terminal_heads.setdefault(grammar.names[body[0]], []).append(self.number[head])
+                elif len(body) == 2 and body[0] in self.number and body[1] in self.number:
+                    pair = self.number[body[0]], self.number[body[1]]
+                    self.pairs.setdefault(pair, []).append(self.number[head])
+                    self.pairs_of.setdefault(self.number[head], []).append(pair)
+                elif body or head != grammar.start:
+                    rule = "".join(grammar.names[symbol] for symbol in body) or IndexedGrammar.lambda_symbol
+                    raise ValueError(f"{grammar.names[head]} -> {rule} is not in Chomsky normal form")
+        self.right_of = [[] for _ in self.variables]
+        for (left, right), heads in self.pairs.items():
+            self.right_of[left].append((right, tuple(heads)))
+        self._numpy = None
+
+    @classmethod
+    def from_grammar(cls, grammar):
+        return cls(IndexedGrammar.from_grammar(grammar).normalize())
+
+    def chart(self, word):
+        # chart[length][variable] is the bitset of start positions i where the variable derives
+        # word[i:i + length]; shifting the right part by the split lines it up with the left part
+        count = len(self.variables)
+        first = [0] * count
+        for position, symbol in enumerate(word):
+            for head in self.terminal_heads.get(symbol, ()):
+                first[head] |= 1 << position
+        chart = [None, first]
+        for length in range(2, len(word) + 1):
+            row = [0] * count
+            for split in range(1, length):
+                left_row = chart[split]
+                right_row = chart[length - split]
+                for left, pairs in enumerate(self.right_of):
+                    starts = left_row[left]
+                    if not starts:
+                        continue
+                    for right, heads in pairs:
+                        matched = starts & right_row[right] >> split
+                        if matched:
+                            for head in heads:
+                                row[head] |= matched
+            chart.append(row)
+        return chart
+
+    def _numpy_tables(self):
+        if self._numpy is None:
+            import numpy as np
+
+            pairs = list(self.pairs.items())
+            heads = np.zeros((len(pairs), len(self.variables)), dtype=np.float32)
+            for row, (_, numbers) in enumerate(pairs):
+                heads[row, numbers] = 1
+            lefts = np.array([left for (left, _), _ in pairs], dtype=np.intp)
+            rights = np.array([right for (_, right), _ in pairs], dtype=np.intp)
+            self._numpy = lefts, rights, heads
+        return self._numpy
+
+    def chart_numpy(self, word):
+        # The chart as boolean matrices, chart[length][start, variable]; each split fills a span length for
+        # all start positions at once, and the matched pairs are folded onto their heads with one matmul
+        import numpy as np
+
+        lefts, rights, heads = self._numpy_tables()
+        n = len(word)
+        first = np.zeros((n, len(self.variables)), dtype=bool)
+        for position, symbol in enumerate(word):
+            first[position, self.terminal_heads.get(symbol, [])] = True
+        chart = [None, first]
+        for length in range(2, n + 1):
+            width = n - length + 1
+            matched = np.zeros((width, len(lefts)), dtype=bool)
+            for split in range(1, length):
+                matched |= chart[split][:width, lefts] & chart[length - split][split:split + width, rights]
+            chart.append(matched.astype(np.float32) @ heads > 0)
+        return chart
+
+    def accepts(self, word, backend="bitset"):
+        if not word:
+            return self.accepts_empty
+        if self.grammar.start not in self.number:
+            return False
+        start = self.number[self.grammar.start]
+        if backend == "numpy":
+            return bool(self.chart_numpy(word)[len(word)][0, start])
+        return bool(self.chart(word)[len(word)][start] & 1)
+
+    def parse(self, word):
+        # One parse tree as nested (variable, children...) tuples with terminals as plain strings, or None.
+        # The tree is rebuilt top-down from the chart with an explicit stack, so long inputs do not recurse
+        names = self.grammar.names
+        if not word:
+            return (names[self.grammar.start],) if self.accepts_empty else None
+        chart = self.chart(word)
+        if self.grammar.start not in self.number or not chart[len(word)][self.number[self.grammar.start]] & 1:
+            return None
+        root = [names[self.grammar.start]]
+        nodes = [root]
+        stack = [(self.number[self.grammar.start], 0, len(word), root)]
+        while stack:
+            head, start, length, node = stack.pop()
+            if length == 1:
+                node.append(word[start])
+                continue
+            split, left, right = next(self.splits(chart, head, start, length))
+            children = [names[self.variables[left]]], [names[self.variables[right]]]
+            node.extend(children)
+            nodes.extend(children)
+            stack.append((left, start, split, children[0]))
+            stack.append((right, start + split, length - split, children[1]))
+        frozen = {}
+        for node in reversed(nodes):
+            frozen[id(node)] = tuple(frozen[id(child)] if isinstance(child, list) else child for child in node)
+        return frozen[id(root)]
+
+    def splits(self, chart, head, start, length):
+        for split in range(1, length):
+            for left, right in self.pairs_of.get(head, ()):
+                if chart[split][left] >> start & 1 and chart[length - split][right] >> start + split & 1:
+                    yield split, left, right
+
+
+class ForestNode:
+    # A node of the shared packed parse forest. label is a symbol name, or (rule, dot) for the intermediate
+    # nodes that stand for the first dot symbols of a rule. Each entry of families is one way of deriving the
+    # span: the single symbol of a one-symbol prefix, or an intermediate node followed by the last symbol;
+    # an empty rule gives the empty family. Terminal leaves have no families.
+    def __init__(self, label, start, end):
+        self.label = label
+        self.start = start
+        self.end = end
+        self.families = []
+
+    def is_intermediate(self):
+        return isinstance(self.label, tuple)
+
+    def __repr__(self):
+        return f"ForestNode({self.label!r}, {self.start}, {self.end})"
+
+
+class SharedPackedForest:
+    def __init__(self, root, nodes):
+        self.root = root
+        self.nodes = nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def ambiguous(self):
+        return any(len(node.families) > 1 for node in self.nodes)
+
+    def grounded_choice(self):
+        # For every node a family whose children were all grounded before it, so following the choices
+        # always ends at terminals even when a cyclic grammar put loops into the forest
+        parents = {}
+        missing = {}
+        choice = {}
+        queue = deque()
+        for node in self.nodes:
+            if not node.families:
+                choice[node] = ()
+                queue.append(node)
+            for number, family in enumerate(node.families):
+                missing[node, number] = len(family)
+                if not family and node not in choice:
+                    choice[node] = family
+                    queue.append(node)
+                for child in family:
+                    parents.setdefault(child, []).append((node, number))
+        while queue:
+            child = queue.popleft()
+            for node, number in parents.get(child, ()):
+                missing[node, number] -= 1
+                if missing[node, number] == 0 and node not in choice:
+                    choice[node] = node.families[number]
+                    queue.append(node)
+        return choice
+
+    def tree(self):
+        # One parse tree as nested (variable, children...) tuples with terminals as plain strings, the shape
+        # CYKParser.parse returns; intermediate nodes are flattened into the children of their symbol node
+        choice = self.grounded_choice()
+        root = [self.root.label]
+        built = [root]
+        pending = [(self.root, root)]
+        while pending:
+            node, subtree = pending.pop()
+            stack = list(reversed(choice[node]))
+            while stack:
+                child = stack.pop()
+                if child.is_intermediate():
+                    stack.extend(reversed(choice[child]))
+                elif not child.families:
+                    subtree.append(child.label)
+                else:
+                    branch = [child.label]
+                    subtree.append(branch)
+                    built.append(branch)
+                    pending.append((child, branch))
+        frozen = {}
+        for subtree in reversed(built):
+            frozen[id(subtree)] = tuple(frozen[id(child)] if isinstance(child, list) else child for child in subtree)
+        return frozen[id(root)]
+
+    def count_trees(self):
+        # The number of distinct parse trees, counted children first; a cycle means infinitely many
+        order = []
+        state = {}
+        for first in self.nodes:
+            if first in state:
+                continue
+            state[first] = "open"
+            stack = [(first, iter([child for family in first.families for child in family]))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if state.get(child) == "open":
+                        raise ValueError("the forest is cyclic, so it holds infinitely many trees")
+                    if child not in state:
+                        state[child] = "open"
+                        stack.append((child, iter([grand for family in child.families for grand in family])))
+                        break
+                else:
+                    stack.pop()
+                    state[node] = "done"
+                    order.append(node)
+        counts = {}
+        for node in order:
+            if not node.families:
+                counts[node] = 1
+                continue
+            total = 0
+            for family in node.families:
+                product = 1
+                for child in family:
+                    product *= counts[child]
+                total += product
+            counts[node] = total
+        return counts[self.root]
+
+
+class EarleyParser:
+    # Earley recognizer over the grammar as written, no normal form needed. Works with any object that has
+    # variables, terminals, productions and start_symbol, so both the lab1 and the lab5 Grammar classes fit.
+    # Nullable symbols are stepped over while predicting, predict[X] lists every rule that can start at the
+    # same position as X, and with leo=True right recursion is completed through Leo's transitive items,
+    # which keeps LR(k) grammars linear. Completed items skipped that way are put back per Earley set only
+    # when a parse forest is built from it.
+    def __init__(self, grammar, leo=True):
+        if not isinstance(grammar, IndexedGrammar):
+            grammar = IndexedGrammar.from_grammar(grammar)
+        self.grammar = grammar
+        self.leo = leo
+        self.heads = []
+        self.bodies = []
+        self.rules_of = {}
+        for head in grammar.heads():
+            for body in grammar.rules_by_head[head]:
+                self.rules_of.setdefault(head, []).append(len(self.bodies))
+                self.heads.append(head)
+                self.bodies.append(body)
+        self.nullable = grammar.nullable_symbols()
+        self.predict = {}
+        self.predicted = {}
+        for symbol in self.rules_of:
+            corner = {symbol}
+            stack = [symbol]
+            while stack:
+                for rule in self.rules_of.get(stack.pop(), ()):
+                    for item in self.bodies[rule]:
+                        if not grammar.variable[item]:
+                            break
+                        if item not in corner:
+                            corner.add(item)
+                            stack.append(item)
+                        if item not in self.nullable:
+                            break
+            self.predicted[symbol] = corner
+            self.predict[symbol] = [rule for item in corner for rule in self.rules_of.get(item, ())]
+
+    def tokens(self, word):
+        ids = self.grammar.ids
+        symbols = []
+        for token in word:
+            symbol = ids.get(token)
+            if symbol is None or self.grammar.variable[symbol]:
+                return None
+            symbols.append(symbol)
+        return symbols
+
+    def recognize(self, word):
+        # Runs the recognizer and returns one (items, waiting, completed, leo_steps) entry per position, or None
+        # when the word holds a symbol that is not a terminal of the grammar. items maps every Earley item
+        # (rule, dot, origin) to the positions where the part before its last symbol ends, which is what the
+        # parse forest is later built from
+        symbols = self.tokens(word)
+        if symbols is None:
+            return None
+        bodies = self.bodies
+        heads = self.heads
+        variable = self.grammar.variable
+        nullable = self.nullable
+        sets = []
+        leo_items = {}
+        scanned = [((rule, 0, 0), None) for rule in self.predict.get(self.grammar.start, ())]
+        for position in range(len(symbols) + 1):
+            items = {}
+            waiting = {}
+            completed = {}
+            leo_steps = []
+            predicted = set(self.predicted.get(self.grammar.start, ())) if position == 0 else set()
+            worklist = []
+            sets.append((items, waiting, completed, leo_steps))
+
+            def add(item, split):
+                if item not in items:
+                    items[item] = set()
+                    worklist.append(item)
+                if split is not None:
+                    items[item].add(split)
+
+            for item, split in scanned:
+                add(item, split)
+            while worklist:
+                rule, dot, origin = worklist.pop()
+                body = bodies[rule]
+                if dot < len(body):
+                    symbol = body[dot]
+                    waiting.setdefault(symbol, []).append((rule, dot, origin))
+                    if not variable[symbol]:
+                        continue
+                    if symbol not in predicted:
+                        predicted |= self.predicted.get(symbol, {symbol})
+                        for predicted_rule in self.predict.get(symbol, ()):
+                            add((predicted_rule, 0, position), None)
+                    if symbol in nullable:
+                        add((rule, dot + 1, origin), position)
+                    continue
+                head = heads[rule]
+                origins = completed.setdefault(head, set())
+                if origin in origins:
+                    continue
+                origins.add(origin)
+                if origin == position:
+                    continue
+                top = self.leo_item(sets, leo_items, origin, head) if self.leo else None
+                if top is not None:
+                    leo_steps.append((origin, head))
+                    add(*top)
+                    continue
+                for waited, waited_dot, waited_origin in sets[origin][1].get(head, ()):
+                    add((waited, waited_dot + 1, waited_origin), origin)
+            if position < len(symbols):
+                scanned = [((rule, dot + 1, origin), position) for rule, dot, origin in
+                           waiting.get(symbols[position], ())]
+        return sets
+
+    def leo_item(self, sets, leo_items, position, symbol):
+        # The topmost completed item of the deterministic right-recursive chain above (symbol, position),
+        # with the position its last symbol starts at; None when the set at position waits for symbol in more
+        # than one way, or not with the last symbol of a rule
+        path = []
+        key = position, symbol
+        while key not in leo_items:
+            waiting = sets[key[0]][1].get(key[1], ())
+            if len(waiting) != 1:
+                leo_items[key] = None
+                break
+            rule, dot, origin = waiting[0]
+            if dot + 1 != len(self.bodies[rule]) or origin == key[0]:
+                leo_items[key] = None
+                break
+            path.append((key, ((rule, dot + 1, origin), key[0])))
+            key = origin, self.heads[rule]
+        top = leo_items[key]
+        for key, step in reversed(path):
+            top = top if top is not None else step
+            leo_items[key] = top
+        return leo_items[position, symbol]
+
+    def accepts(self, word):
+        sets = self.recognize(word)
+        if sets is None:
+            return False
+        return 0 in sets[-1][2].get(self.grammar.start, ())
+
+    def parse(self, word):
+        sets = self.recognize(word)
+        if sets is None or 0 not in sets[-1][2].get(self.grammar.start, ()):
+            return None
+        return ForestBuilder(self, sets, len(word)).build()
+
+
+class ForestBuilder:
+    def __init__(self, parser, sets, length):
+        self.parser = parser
+        self.sets = sets
+        self.length = length
+        self.restored = set()
+        self.nodes = {}
+        self.pending = []
+
+    def restore(self, position):
+        # Puts back the completed items that Leo's transitive items jumped over at this position, each with
+        # the split its chain step implies
+        if position in self.restored:
+            return
+        self.restored.add(position)
+        items, waiting, completed, leo_steps = self.sets[position]
+        parser = self.parser
+        for origin, symbol in leo_steps:
+            while True:
+                rule, dot, waited_origin = self.sets[origin][1][symbol][0]
+                item = rule, dot + 1, waited_origin
+                known = item in items
+                items.setdefault(item, set()).add(origin)
+                if known:
+                    break
+                completed.setdefault(parser.heads[rule], set()).add(waited_origin)
+                origin, symbol = waited_origin, parser.heads[rule]
+
+    def node(self, label, start, end):
+        key = label, start, end
+        if key not in self.nodes:
+            self.nodes[key] = ForestNode(label, start, end)
+            self.pending.append(key)
+        return self.nodes[key]
+
+    def build(self):
+        parser = self.parser
+        grammar = parser.grammar
+        root = self.node(grammar.names[grammar.start], 0, self.length)
+        while self.pending:
+            label, start, end = self.pending.pop()
+            node = self.nodes[label, start, end]
+            if node.is_intermediate():
+                node.families.extend(self.prefix_families(*label, start, end))
+                continue
+            symbol = grammar.ids[label]
+            if not grammar.variable[symbol]:
+                continue
+            self.restore(end)
+            items = self.sets[end][0]
+            for rule in parser.rules_of.get(symbol, ()):
+                if (rule, len(parser.bodies[rule]), start) in items:
+                    node.families.extend(self.prefix_families(rule, len(parser.bodies[rule]), start, end))
+        return SharedPackedForest(root, list(self.nodes.values()))
+
+    def prefix_families(self, rule, dot, start, end):
+        # body[:dot] over [start, end) for every recorded split: the part before the last symbol as an
+        # intermediate node, left out when it is a single symbol, and the last symbol as a symbol node
+        if dot == 0:
+            return [()]
+        symbol = self.parser.grammar.names[self.parser.bodies[rule][dot - 1]]
+        splits = sorted(self.sets[end][0][rule, dot, start])
+        if dot == 1:
+            return [(self.node(symbol, split, end),) for split in splits]
+        return [(self.node((rule, dot - 1), start, split), self.node(symbol, split, end)) for split in splits]
+
+
+def benchmark_empty_elimination(sizes=(15, 16, 17, 18, 19, 20)):
+    # S -> NaNa...Na with N -> n | ε, so the only rule of S has one nullable occurrence per a
+    for size in sizes:
+        grammar = Grammar({"S", "N"}, {"a", "n"}, {"S": ["Na" * size], "N": ["n", "ε"]}, "S")
+        start = time.perf_counter()
+        indexed = IndexedGrammar.from_grammar(grammar)
+        indexed.remove_empty_rules()
+        elapsed = time.perf_counter() - start
+        print(f"nullable occurrences: {size:3d}  rules for S: {len(indexed.rules_by_head[indexed.start]):8d}  "
+              f"time: {elapsed:.3f}s")
+
+
+def benchmark_cyk(grammar, lengths=(100, 250, 500, 1000), numpy_limit=250, seed=0):
+    parser = CYKParser.from_grammar(grammar)
+    terminals = sorted(parser.terminal_heads)
+    rng = random.Random(seed)
+    for length in lengths:
+        word = "".join(rng.choice(terminals) for _ in range(length))
+        start = time.perf_counter()
+        accepted = parser.accepts(word)
+        bitset_time = time.perf_counter() - start
+        line = f"length: {length:5d}  accepted: {accepted!s:5}  bitset: {bitset_time:.3f}s"
+        if length <= numpy_limit:
+            start = time.perf_counter()
+            assert parser.accepts(word, backend="numpy") == accepted
+            line += f"  numpy: {time.perf_counter() - start:.3f}s"
+        print(line)
+
+
+def benchmark_earley(lengths=(500, 1000, 2000, 4000), quadratic_limit=2000):
+    # S -> aS | a completes a right-recursive chain at every position: linear with Leo's items,
+    # quadratic without them
+    grammar = Grammar({"S"}, {"a"}, {"S": ["aS", "a"]}, "S")
+    parsers = {True: EarleyParser(grammar), False: EarleyParser(grammar, leo=False)}
+    for length in lengths:
+        word = "a" * length
+        line = f"right recursion: {length:5d}"
+        for leo, parser in parsers.items():
+            if not leo and length > quadratic_limit:
+                continue
+            start = time.perf_counter()
+            forest = parser.parse(word)
+            line += f"  {'leo' if leo else 'plain'}: {time.perf_counter() - start:.3f}s"
+        print(line + f"  forest nodes: {len(forest)}")
 
 
 variables = {"S", "A", "B", "C", "D", "E"}
@@ -160,6 +899,33 @@ productions = {
     "E": ["aB"]
 }
 
-grammar = Grammar(variables, terminals, productions, start_symbol)
 
-grammar.transform_to_chomsky_normal_form()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="Convert the example grammar to Chomsky normal form.")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="benchmark empty-rule elimination, CYK and Earley parsing")
+    parser.add_argument('--parse', metavar='WORD', help="parse WORD with CYK using the normalized grammar")
+    parser.add_argument('--earley', action='store_true',
+                        help="parse WORD with the Earley parser on the original grammar instead")
+    args = parser.parse_args()
+
+    grammar = Grammar(variables, terminals, productions, start_symbol)
+    if args.benchmark:
+        benchmark_empty_elimination()
+        benchmark_cyk(grammar)
+        benchmark_earley()
+        return
+
+    if args.parse is not None and args.earley:
+        forest = EarleyParser(grammar).parse(args.parse)
+        print(forest and forest.tree())
+        print(f"parse trees: {forest.count_trees() if forest else 0}")
+        return
+
+    grammar.transform_to_chomsky_normal_form()
+    if args.parse is not None:
+        print(CYKParser(grammar).parse(args.parse))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+from array import array
 from enum import Enum, auto
 import re
 
@@ -13,7 +14,7 @@ class TokenType(Enum):
     ILLEGAL = auto()
 
 class ArithmeticLexer:
-    def __init__(self):
+    def __init__(self, compiled=False):
         self.rules = [
             (r'[ \t]+', None),  # Ignore whitespace
             (r'\d+\.\d+', TokenType.FLOAT),
@@ -27,7 +28,23 @@ class ArithmeticLexer:
         ]
         self.rules = [(re.compile(pattern), token_type) for (pattern, token_type) in self.rules]
 
+        # Compiled mode: all rules fused into one alternation with a named group per rule, tried in the
+        # same order, plus a catch-all group so every position matches and finditer never skips text
+        self.compiled = compiled
+        self.group_types = {f'RULE{i}': token_type for i, (_, token_type) in enumerate(self.rules)}
+        self.group_types['ILLEGAL'] = TokenType.ILLEGAL
+        alternatives = [f'(?P<RULE{i}>{pattern.pattern})' for i, (pattern, _) in enumerate(self.rules)]
+        self.master_pattern = re.compile('|'.join(alternatives + ['(?P<ILLEGAL>.)']), re.DOTALL)
+
+        # Token kinds are numbered for TokenBuffer, skipped rules have no kind
+        self.token_types = [token_type for (_, token_type) in self.rules if token_type] + [TokenType.ILLEGAL]
+        self.group_kinds = {group: (self.token_types.index(token_type) if token_type else None)
+                            for group, token_type in self.group_types.items()}
+
     def tokenize(self, text):
+        if self.compiled:
+            yield from self.tokenize_compiled(text)
+            return
         pos = 0
         while pos < len(text):
             match = None
@@ -44,6 +61,63 @@ class ArithmeticLexer:
             else:
                 pos = match.end(0)
 
+    def tokenize_compiled(self, text):
+        group_types = self.group_types
+        for match in self.master_pattern.finditer(text):
+            token_type = group_types[match.lastgroup]
+            if token_type:  # Ignore tokens like whitespace
+                yield (token_type, match.group())
+
+    def tokenize_spans(self, text):
+        # Lazily yields (token_type, start, end) without slicing the token text
+        group_types = self.group_types
+        for match in self.master_pattern.finditer(text):
+            token_type = group_types[match.lastgroup]
+            if token_type:
+                yield (token_type, match.start(), match.end())
+
+    def tokenize_buffer(self, text):
+        buffer = TokenBuffer(text, self.token_types)
+        kinds, starts, ends = buffer.kinds, buffer.starts, buffer.ends
+        group_kinds = self.group_kinds
+        for match in self.master_pattern.finditer(text):
+            kind = group_kinds[match.lastgroup]
+            if kind is not None:
+                kinds.append(kind)
+                start, end = match.span()
+                starts.append(start)
+                ends.append(end)
+        return buffer
+
+
+class TokenBuffer:
+    # Tokens of one text as parallel arrays of kind codes and offsets into the text (9 bytes per token),
+    # the (type, value) pairs the parser and validate_expression use are only built when indexed
+    def __init__(self, text, token_types):
+        self.text = text
+        self.token_types = token_types
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        return (self.token_types[self.kinds[index]], self.text[self.starts[index]:self.ends[index]])
+
+    def __iter__(self):
+        text = self.text
+        token_types = self.token_types
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            yield (token_types[kind], text[start:end])
+
+    def type_at(self, index):
+        return self.token_types[self.kinds[index]]
+
+    def value_at(self, index):
+        return self.text[self.starts[index]:self.ends[index]]
+
 class ASTNode:
     pass
 
@@ -111,11 +185,15 @@ class Parser:
 
     def current_token(self):
         if self.pos < len(self.tokens):
+            if isinstance(self.tokens, TokenBuffer):
+                return self.tokens.type_at(self.pos)
             return self.tokens[self.pos][0]
         return None
 
     def current_value(self):
         if self.pos < len(self.tokens):
+            if isinstance(self.tokens, TokenBuffer):
+                return self.tokens.value_at(self.pos)
             return self.tokens[self.pos][1]
         return None
 
@@ -154,6 +232,61 @@ def validate_expression(tokens):
 
     return True, "Valid expression"
 
+
+def build_sequence_errors():
+    # (last token type, token type) -> message, the same sequence checks as validate_expression in one table
+    operators = (TokenType.PLUS, TokenType.MINUS, TokenType.MUL, TokenType.DIV)
+    token_types = (TokenType.FLOAT, TokenType.INTEGER, TokenType.PLUS, TokenType.MINUS, TokenType.MUL, TokenType.DIV,
+                   TokenType.LPAREN, TokenType.RPAREN, TokenType.ILLEGAL)
+    errors = {}
+    for last_token_type in (None,) + token_types:
+        for token_type in token_types:
+            if last_token_type in operators and token_type in operators + (TokenType.RPAREN,):
+                errors[(last_token_type, token_type)] = "Invalid operator usage"
+            elif last_token_type == TokenType.LPAREN and token_type in operators + (TokenType.RPAREN,):
+                errors[(last_token_type, token_type)] = "Invalid expression after '('"
+            elif (last_token_type in (TokenType.INTEGER, TokenType.FLOAT, TokenType.RPAREN)
+                  and token_type == TokenType.LPAREN):
+                errors[(last_token_type, token_type)] = "Invalid expression before '('"
+    return errors
+
+
+SEQUENCE_ERRORS = build_sequence_errors()
+
+
+def utf8_offset(text, index, chunk_size=1 << 16):
+    # Byte offset of text[index] in the UTF-8 encoding of text, encoded a chunk at a time so the prefix
+    # is never copied whole
+    return sum(len(text[start:min(start + chunk_size, index)].encode('utf-8', 'surrogatepass'))
+               for start in range(0, index, chunk_size))
+
+
+def validate_stream(text, lexer=None):
+    # Same result as validate_expression plus the UTF-8 byte offset of the first error (the encoded length
+    # of text when the error is only found at the end), using a depth counter and consuming the tokens
+    # lazily in O(1) memory. Character and byte offsets differ once the text has non-ASCII characters,
+    # e.g. Unicode digits matched by \d.
+    lexer = lexer or ArithmeticLexer(compiled=True)
+    sequence_errors = SEQUENCE_ERRORS
+    depth = 0
+    last_token_type = None
+    for token_type, start, end in lexer.tokenize_spans(text):
+        if token_type == TokenType.ILLEGAL:
+            return False, f"Illegal character found: {text[start:end]}", utf8_offset(text, start)
+        if token_type == TokenType.LPAREN:
+            depth += 1
+        elif token_type == TokenType.RPAREN:
+            if not depth:
+                return False, "Unbalanced parentheses", utf8_offset(text, start)
+            depth -= 1
+        message = sequence_errors.get((last_token_type, token_type))
+        if message:
+            return False, message, utf8_offset(text, start)
+        last_token_type = token_type
+    if depth:
+        return False, "Unbalanced parentheses", utf8_offset(text, len(text))
+    return True, "Valid expression", None
+
 # Example usage
 lexer = ArithmeticLexer()
 expression = '(3.14 + 2 * (1 - 5))'